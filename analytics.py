@@ -0,0 +1,288 @@
+"""
+Categorical Marking System - Analytics
+Running cohort analytics that are updated as students are inserted.
+"""
+# Necessary Imports
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from itertools import accumulate, chain, islice
+
+
+# Sorted scores class - a list of sorted buckets, giving order statistics without sorting the cohort. Values can be
+# any comparable items, e.g. (overall, row) pairs
+class SortedScores:
+    bucket_size = 512 # Buckets are split when they grow past twice this size
+
+    # Initializing empty buckets
+    def __init__(self):
+        self.clear()
+
+    # Method to remove all scores
+    def clear(self):
+        self.buckets = []
+        self.maxes = [] # Largest value of each bucket, searched with bisect
+        self.offsets = None # Position of the first value of each bucket, rebuilt on first positional lookup
+        self.size = 0
+
+    # Method to rebuild the buckets from a sorted list
+    def rebuild(self, values):
+        size = self.bucket_size
+        self.buckets = [values[i:i + size] for i in range(0, len(values), size)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.offsets = None
+        self.size = len(values)
+
+    # Method to add one score
+    def add(self, value):
+        self.offsets = None
+        if not self.buckets:
+            self.buckets.append([value])
+            self.maxes.append(value)
+            self.size = 1
+            return
+        i = bisect_left(self.maxes, value)
+        if i == len(self.buckets): # Larger than everything - goes in the last bucket
+            i -= 1
+        bucket = self.buckets[i]
+        insort(bucket, value)
+        self.maxes[i] = bucket[-1]
+        self.size += 1
+        if len(bucket) > 2 * self.bucket_size: # Split an oversized bucket in half
+            half = len(bucket) // 2
+            self.buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            self.maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+
+    # Method to add many scores - large batches are merged and rebuilt instead of inserted one by one
+    def update(self, values):
+        values = list(values)
+        if len(values) * 8 > self.size:
+            merged = [v for bucket in self.buckets for v in bucket]
+            merged.extend(values)
+            merged.sort() # Timsort merges the two sorted runs in linear time
+            self.rebuild(merged)
+        else:
+            for value in values:
+                self.add(value)
+
+    # Method to remove one score - raises ValueError if it is not present
+    def remove(self, value):
+        self.offsets = None
+        i = bisect_left(self.maxes, value)
+        if i < len(self.buckets):
+            bucket = self.buckets[i]
+            j = bisect_left(bucket, value)
+            if j < len(bucket) and bucket[j] == value:
+                del bucket[j]
+                self.size -= 1
+                if bucket:
+                    self.maxes[i] = bucket[-1]
+                else:
+                    del self.buckets[i]
+                    del self.maxes[i]
+                return
+        raise ValueError(f"{value} is not in the scores.")
+
+    # Method to count scores between low and high, inclusive
+    def count_between(self, low, high):
+        return self.rank(high, inclusive=True) - self.rank(low)
+
+    # Method to count scores below a value (or up to it, when inclusive)
+    def rank(self, value, inclusive=False):
+        search = bisect_right if inclusive else bisect_left
+        i = search(self.maxes, value)
+        if i == len(self.buckets):
+            return self.size
+        return self.bucket_offsets()[i] + search(self.buckets[i], value)
+
+    # Method to get the position of each bucket's first value - kept until the next change
+    def bucket_offsets(self):
+        if self.offsets is None:
+            self.offsets = list(accumulate((len(bucket) for bucket in self.buckets), initial=0))
+        return self.offsets
+
+    # Method to find the bucket and index within it for a position
+    def locate(self, position):
+        i = bisect_right(self.bucket_offsets(), position) - 1
+        return i, position - self.offsets[i]
+
+    # Method to iterate from a position, upwards or (reverse) downwards - lazy, so taking k values costs O(log n + k)
+    def iterate(self, start=0, reverse=False):
+        if not 0 <= start < self.size:
+            return iter(())
+        i, j = self.locate(start)
+        if reverse:
+            return chain(reversed(self.buckets[i][:j + 1]),
+                         (value for bucket in reversed(self.buckets[:i]) for value in reversed(bucket)))
+        return chain(islice(self.buckets[i], j, None), (value for bucket in self.buckets[i + 1:] for value in bucket))
+
+    # Method to iterate over the values between low and high, inclusive, lowest first
+    def irange(self, low, high):
+        return islice(self.iterate(self.rank(low)), max(self.rank(high, inclusive=True) - self.rank(low), 0))
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.size
+        if not 0 <= position < self.size:
+            raise IndexError("Position out of range.")
+        i, j = self.locate(position)
+        return self.buckets[i][j]
+
+    def __len__(self):
+        return self.size
+
+
+# Cohort analytics class - count, sum, min, max, category histogram and order statistics kept up to date on insert
+class CohortAnalytics:
+
+    # Initializing empty accumulators
+    def __init__(self):
+        self.scores = SortedScores()
+        self.clear()
+
+    # Method to reset all accumulators
+    def clear(self):
+        self.count = 0
+        self.total = 0.0
+        self.compensation = 0.0 # Neumaier correction so the mean does not drift on large cohorts
+        self.category_counts = {} # Category -> count, in order of first appearance
+        self.scores.clear()
+
+    # Method to add to the running sum
+    def accumulate(self, value):
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    # Method to record one student
+    def add(self, overall, category):
+        self.count += 1
+        self.accumulate(overall)
+        self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.scores.add(overall)
+
+    # Method to record many students at once
+    def extend(self, overalls, categories):
+        overalls = list(overalls)
+        for overall in overalls:
+            self.accumulate(overall)
+        for category in categories:
+            self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.count += len(overalls)
+        self.scores.update(overalls)
+
+    # Method to forget one student, e.g. when it is replaced or deleted
+    def remove(self, overall, category):
+        self.scores.remove(overall)
+        self.count -= 1
+        self.accumulate(-overall)
+        self.category_counts[category] -= 1
+        if not self.category_counts[category]:
+            del self.category_counts[category]
+
+    # Methods for the summary figures - all of them need at least one student
+    def minimum(self):
+        return self.scores[0]
+
+    def maximum(self):
+        return self.scores[-1]
+
+    def mean(self):
+        if not self.count:
+            raise ValueError("No student data available.")
+        return (self.total + self.compensation) / self.count
+
+    def median(self):
+        middle = self.count // 2
+        if self.count % 2:
+            return self.scores[middle]
+        return (self.scores[middle - 1] + self.scores[middle]) / 2
+
+    # Method to get a percentile (0-100) with linear interpolation between ranks
+    def percentile(self, percent):
+        if not 0 <= percent <= 100:
+            raise ValueError("Percentile must be between 0 and 100")
+        position = (self.count - 1) * percent / 100
+        lower = int(position)
+        if lower + 1 >= self.count:
+            return self.scores[lower]
+        fraction = position - lower
+        return self.scores[lower] + (self.scores[lower + 1] - self.scores[lower]) * fraction
+
+    # Method to get every figure at once - e.g. for a live dashboard during ingestion
+    def summary(self):
+        if not self.count:
+            return {'count': 0, 'categories': {}}
+        return {
+            'count': self.count,
+            'min': self.minimum(),
+            'max': self.maximum(),
+            'mean': self.mean(),
+            'median': self.median(),
+            'categories': dict(self.category_counts),
+        }
+
+
+# Score index class - ordered (overall, row) pairs for the whole cohort and per category, for queries that only touch
+# the students they return
+class ScoreIndex:
+
+    # Initializing empty indexes
+    def __init__(self):
+        self.by_overall = SortedScores()
+        self.by_category = {} # Category -> SortedScores of (overall, row)
+
+    # Method to index one student
+    def add(self, overall, category, row):
+        entry = (overall, row)
+        self.by_overall.add(entry)
+        self.category_scores(category).add(entry)
+
+    # Method to index many students - rows are consecutive from start
+    def extend(self, overalls, categories, start):
+        entries = [(overall, row) for row, overall in enumerate(overalls, start)]
+        self.by_overall.update(entries)
+        grouped = {}
+        for entry, category in zip(entries, categories):
+            grouped.setdefault(category, []).append(entry)
+        for category, members in grouped.items():
+            self.category_scores(category).update(members)
+
+    # Method to drop one student, e.g. when it is replaced
+    def remove(self, overall, category, row):
+        entry = (overall, row)
+        self.by_overall.remove(entry)
+        self.by_category[category].remove(entry)
+
+    # Method to get the ordered index of a category, creating it for a new one
+    def category_scores(self, category):
+        scores = self.by_category.get(category)
+        if scores is None:
+            scores = self.by_category[category] = SortedScores()
+        return scores
+
+    # Method to get the rows in any of the categories, lowest overall first
+    def in_categories(self, categories):
+        indexes = [self.by_category[c] for c in dict.fromkeys(categories) if c in self.by_category]
+        return [row for _, row in merge(*(index.iterate() for index in indexes))]
+
+    # Method to get the rows of the k highest (or, with lowest, the k lowest) overall scores
+    def top(self, k, lowest=False):
+        index = self.by_overall
+        start = 0 if lowest else len(index) - 1
+        return [row for _, row in islice(index.iterate(start, reverse=not lowest), max(k, 0))]
+
+    # Method to get the rows with low <= overall <= high, lowest first
+    def between(self, low, high):
+        return [row for _, row in self.by_overall.irange((low, -1), (high, float('inf')))]
+
+    # Method to get the percentile rank (0-100) of an overall score - students below it, plus half of those level with it
+    def percentile_rank(self, overall):
+        index = self.by_overall
+        if not len(index):
+            raise ValueError("No student data available.")
+        below = index.rank((overall, -1))
+        level = index.rank((overall, float('inf')), inclusive=True) - below
+        return 100 * (below + level / 2) / len(index)
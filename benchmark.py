@@ -0,0 +1,191 @@
+"""
+Categorical Marking System - Benchmarks
+Times ingestion, grading, analytics and export across input sizes and worker counts, and how long the
+modules take to import in a fresh interpreter.
+
+Example:
+    python benchmark.py --sizes 1000 100000 1000000 --workers 0 4 --output bench.json
+    python benchmark.py --sizes 1000 100000 --baseline bench.json
+"""
+# Necessary Imports
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from logs import configure_logging
+from program import CategoricalMarkingSystem
+from test_data_generator import generate_test_data, id_width_for
+
+STAGES = ('ingest', 'grade', 'analytics', 'export')
+ACCEPTED_TOLERANCE = 0.05 # Allowed relative gap between graded students and the generator's expected count
+IMPORT_MODULES = ('core', 'program') # Modules whose import time is measured
+LAZY_MODULES = ('smtplib', 'email.mime', 'tabulate', 'csv', 'sqlite3', 'concurrent.futures.process') # Loaded on first use only
+
+# Run in a fresh interpreter - prints the import time and which lazy modules the import pulled in
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+# Method to time one call - returns (seconds, result)
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+# Method to run every stage once on one input file - returns seconds per stage
+def run_stages(filename, output, mode, workers, id_digits=2):
+    cms = CategoricalMarkingSystem()
+    cms.set_id_format(id_digits) # Otherwise IDs wider than the default are rejected and almost nothing is graded
+    timings = {}
+    with contextlib.redirect_stdout(io.StringIO()): # Skipped-line and progress messages are not part of the timing
+        timings['ingest'], _ = timed(cms.advanced, filename, vectorized=(mode == 'vectorized'),
+                                     streaming=(mode == 'streaming'), workers=workers)
+        timings['grade'], _ = timed(cms.regrade)
+        timings['analytics'], _ = timed(cms.show_analytics)
+        timings['export'], _ = timed(cms.save_to_file, output)
+    timings['students'] = len(cms.students_data)
+    return timings
+
+
+# Method to time importing a module in fresh interpreters - best of repeat runs, so start-up noise is left out
+def time_import(module, repeat=5):
+    script = IMPORT_SCRIPT.format(module=module, lazy=LAZY_MODULES)
+    runs = [json.loads(subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))).stdout) for _ in range(repeat)]
+    return {'module': module, 'seconds': min(run['seconds'] for run in runs), 'loaded': runs[0]['loaded']}
+
+
+# Method to check that a run graded the students the data was generated with - a benchmark of rejected lines measures
+# nothing. Duplicate lines repeat an earlier ID, so they are rejected as well.
+def check_students(students, size, malformed, duplicates):
+    expected = size * (1 - malformed - duplicates)
+    if abs(students - expected) > ACCEPTED_TOLERANCE * expected + 10:
+        raise RuntimeError(f"Graded {students} of {size} generated students, expected about {expected:.0f}.")
+
+
+# Method to get the current git revision, if there is one
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Method to run the whole benchmark - returns the results document
+def run_benchmark(sizes, workers_list, modes, repeat=3, seed=42, malformed=0.01, duplicates=0.01, workdir=None,
+                  imports=IMPORT_MODULES):
+    imported = []
+    for module in imports:
+        imported.append(time_import(module, max(repeat, 5)))
+        print(f"import {module}={imported[-1]['seconds']:.4f}s", file=sys.stderr)
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            filename = os.path.join(tmp, f"marks_{size}.txt")
+            generate_seconds, _ = timed(generate_test_data, size, filename, seed, malformed, duplicates)
+            print(f"Generated {size} records in {generate_seconds:.2f}s", file=sys.stderr)
+            for mode in modes:
+                for workers in workers_list:
+                    if workers and mode != 'vectorized': # Worker processes always grade vectorized
+                        continue
+                    runs = [run_stages(filename, os.path.join(tmp, 'out.csv'), mode, workers, id_width_for(size))
+                            for _ in range(repeat)]
+                    check_students(runs[0]['students'], size, malformed, duplicates)
+                    entry = {'size': size, 'mode': mode, 'workers': workers, 'students': runs[0]['students']}
+                    for stage in STAGES: # Best of the repeats, the least noisy figure
+                        entry[stage] = min(run[stage] for run in runs)
+                    entry['total'] = sum(entry[stage] for stage in STAGES)
+                    results.append(entry)
+                    print(f"size={size} mode={mode} workers={workers} " +
+                          ' '.join(f"{stage}={entry[stage]:.4f}s" for stage in STAGES), file=sys.stderr)
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'repeat': repeat, 'seed': seed, 'malformed': malformed, 'duplicates': duplicates},
+        'results': results,
+        'imports': imported,
+    }
+
+
+# Method to compare against an earlier results file - returns the stages and imports that got slower than the
+# threshold, and imports that now load a module the baseline left for first use
+def compare(current, baseline, threshold=1.2):
+    earlier = {(r['size'], r['mode'], r['workers']): r for r in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        old = earlier.get((entry['size'], entry['mode'], entry['workers']))
+        if old is None:
+            continue
+        for stage in STAGES + ('total',):
+            if old[stage] > 0 and entry[stage] / old[stage] > threshold:
+                regressions.append({'size': entry['size'], 'mode': entry['mode'], 'workers': entry['workers'],
+                                    'stage': stage, 'before': old[stage], 'after': entry[stage],
+                                    'ratio': round(entry[stage] / old[stage], 3)})
+    earlier_imports = {entry['module']: entry for entry in baseline.get('imports', [])}
+    for entry in current.get('imports', []):
+        old = earlier_imports.get(entry['module'])
+        if old is None:
+            continue
+        if old['seconds'] > 0 and entry['seconds'] / old['seconds'] > threshold:
+            regressions.append({'import': entry['module'], 'stage': 'import', 'before': old['seconds'],
+                                'after': entry['seconds'], 'ratio': round(entry['seconds'] / old['seconds'], 3)})
+        eager = sorted(set(entry['loaded']) - set(old['loaded']))
+        if eager:
+            regressions.append({'import': entry['module'], 'stage': 'eager', 'modules': eager})
+    return regressions
+
+
+# Method to run from the command line - returns the exit code
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Categorical Marking System.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0], help="Worker counts; 0 means single process")
+    parser.add_argument('--modes', nargs='+', choices=['threads', 'vectorized', 'streaming'], default=['vectorized'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--malformed', type=float, default=0.01, help="Fraction of broken lines")
+    parser.add_argument('--duplicates', type=float, default=0.01, help="Fraction of repeated IDs")
+    parser.add_argument('--imports', nargs='*', default=list(IMPORT_MODULES),
+                        help="Modules whose import time is measured (default core program; none to skip)")
+    parser.add_argument('--output', help="Write the JSON results here (default stdout)")
+    parser.add_argument('--baseline', help="Earlier JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    document = run_benchmark(args.sizes, args.workers, args.modes, args.repeat, args.seed, args.malformed, args.duplicates,
+                             imports=args.imports)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            document['regressions'] = compare(document, json.load(f), args.threshold)
+        exit_code = 1 if document['regressions'] else 0
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Categorical Marking System - Batch mode
+Grades many module files in one non-interactive run.
+
+Example:
+    python cms_batch.py --weights 10 20 30 40 --output-dir results --workers 8 marks/
+"""
+# Necessary Imports
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from program import CategoricalMarkingSystem
+from logs import configure_logging
+from ingestion import COMPRESSED_OPENERS, expand_inputs, is_compressed
+
+
+# Method to build the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(description="Grade module mark files without prompts.")
+    parser.add_argument('inputs', nargs='+', help="Mark files (plain, .gz, .bz2 or .xz) or directories of mark files")
+    parser.add_argument('--weights', type=float, nargs='+', help="Component weights in percent, summing to 100 (default 10 20 30 40)")
+    parser.add_argument('--components', nargs='+', help="Component names, one per weight")
+    parser.add_argument('--id-digits', type=int, default=2, help="Digits in a student ID (default 2)")
+    parser.add_argument('--pattern', help="File pattern used inside directories (default *.txt and compressed *.txt.gz/.bz2/.xz)")
+    parser.add_argument('--combine', metavar='NAME',
+                        help="Grade every input as one cohort called NAME - an ID repeated in a later file is a duplicate")
+    parser.add_argument('--output-dir', default='.', help="Directory for the graded files (default: current directory)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="Output format (default csv)")
+    parser.add_argument('--gzip', action='store_true', help="Gzip-compress the output files")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes shared by all files (default: single process)")
+    parser.add_argument('--streaming', action='store_true', help="Grade each file in bounded memory instead of vectorized")
+    parser.add_argument('--database', help="Also store every graded file in this SQLite database, one module per file")
+    parser.add_argument('--snapshot-dir', help="Keep binary snapshots here and reuse them for unchanged files")
+    parser.add_argument('--checkpoint-dir', help="Save resumable checkpoints here while grading; an interrupted file carries on from its checkpoint")
+    parser.add_argument('--checkpoint-every', type=int, default=500000, help="Lines between checkpoints (default 500000)")
+    parser.add_argument('--summary', help="Write the JSON run summary to this file instead of stdout")
+    parser.add_argument('--show', action='store_true', help="Also print each summary table and skipped lines")
+    parser.add_argument('--summarise-rejections', type=float, metavar='SECONDS',
+                        help="Log rejected lines as one summary per reason every SECONDS, through a background log writer")
+    return parser
+
+
+# Method to get the module name of an input file - marks.txt.gz is module marks, a/marks.txt is module a/marks
+def module_name(filename):
+    stem, suffix = os.path.splitext(filename)
+    if suffix.lower() in COMPRESSED_OPENERS:
+        stem = os.path.splitext(stem)[0]
+    return stem.replace(os.sep, '/')
+
+
+# Method to name each input by its path below the common directory of all inputs - in/a/marks.txt and
+# in/b/marks.txt become a/marks.txt and b/marks.txt, so their outputs, snapshots and modules never collide
+def relative_names(files):
+    if not files:
+        return {}
+    directories = [os.path.dirname(os.path.abspath(filename)) for filename in files]
+    root = os.path.commonpath(directories)
+    return {filename: os.path.normpath(os.path.join(os.path.relpath(directory, root), os.path.basename(filename)))
+            for filename, directory in zip(files, directories)}
+
+
+# Method to work out the output path for a module name
+def output_path(module, output_dir, fmt, compress):
+    return os.path.join(output_dir, f"{module}.{fmt}" + ('.gz' if compress else ''))
+
+
+# Method to get a file path under a directory, creating its subdirectories
+def path_under(directory, relative):
+    path = os.path.join(directory, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+# Method to grade one file, or a list of files as one cohort called relative - returns its entry for the run summary
+def grade_file(cms, filename, relative, args, executor=None):
+    combined = isinstance(filename, list)
+    entry = {'input': filename}
+    if not combined and not os.path.isfile(filename):
+        entry['error'] = "File not found"
+        return entry
+
+    if combined:
+        missing = [f for f in filename if not os.path.isfile(f)]
+        if missing:
+            entry['missing'] = missing
+
+    start = time.perf_counter()
+    module = relative if combined else module_name(relative)
+    snapshot = checkpoint = None
+    if not combined and args.snapshot_dir:
+        snapshot = path_under(args.snapshot_dir, relative + '.snap')
+    if not combined and args.checkpoint_dir and not is_compressed(filename): # Compressed files cannot seek to resume
+        checkpoint = path_under(args.checkpoint_dir, relative + '.ckpt')
+    with contextlib.ExitStack() as stack:
+        if not args.show: # Keep per-line messages out of the summary on stdout
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        cms.advanced(filename, vectorized=not args.streaming, streaming=args.streaming,
+                     workers=args.workers if args.workers > 1 else 0, snapshot=snapshot, executor=executor,
+                     checkpoint=checkpoint, checkpoint_every=args.checkpoint_every)
+        entry['output'] = output_path(module, args.output_dir, args.format, args.gzip)
+        os.makedirs(os.path.dirname(entry['output']), exist_ok=True)
+        cms.display_and_save_data(show=args.show, path=entry['output'], fmt=args.format, compress=args.gzip)
+        if args.database:
+            entry['module'] = module
+            cms.save_to_repository(args.database, entry['module'], replace=True)
+
+    summary = cms.students_data.analytics.summary()
+    entry['students'] = summary.pop('count')
+    entry['categories'] = cms.students_data.category_counts()
+    summary.pop('categories')
+    entry['analytics'] = summary
+    entry['metrics'] = cms.ingestion_metrics()
+    entry['seconds'] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+# Method to run the batch - returns the process exit code
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+    cms = CategoricalMarkingSystem() # One instance, so grading tables and caches are shared by every file
+    if args.summarise_rejections is not None:
+        cms.use_aggregated_logging(interval=args.summarise_rejections)
+    try:
+        cms.set_id_format(args.id_digits)
+        if args.weights:
+            cms.module_config.set_weights(args.weights, args.components)
+        elif args.components:
+            raise ValueError("Component names need --weights.")
+    except ValueError as e:
+        print(f"Invalid module configuration: {e}", file=sys.stderr)
+        return 2
+
+    files = expand_inputs(args.inputs, args.pattern)
+    names = relative_names(files)
+    modules = {}
+    for filename in files: # Two inputs with one module name would overwrite each other's output and rows
+        other = modules.setdefault(module_name(names[filename]), filename)
+        if other != filename and not args.combine:
+            print(f"{other} and {filename} would both be written as module {module_name(names[filename])}", file=sys.stderr)
+            return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.snapshot_dir:
+        os.makedirs(args.snapshot_dir, exist_ok=True)
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        if args.combine:
+            results = [grade_file(cms, files, args.combine, args, executor)]
+        else:
+            results = [grade_file(cms, filename, names[filename], args, executor) for filename in files]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    run_summary = {
+        'weights': cms.module_config.get_weights(),
+        'files': results,
+        'graded_files': sum(1 for r in results if 'error' not in r),
+        'failed_files': sum(1 for r in results if 'error' in r),
+        'students': sum(r.get('students', 0) for r in results),
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    logging.info(f"Batch run graded {run_summary['graded_files']} files")
+    text = json.dumps(run_summary, indent=2)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if run_summary['failed_files'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,479 @@
+"""
+Categorical Marking System - Cohort grading
+Vectorized grading and columnar storage of a whole cohort with NumPy.
+"""
+# Necessary Imports
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+import numpy as np
+from analytics import CohortAnalytics, ScoreIndex
+
+DEFAULT_WHAT_IF_MEMORY = 256 << 20 # Bytes of working arrays held at once when evaluating candidate weights
+WHAT_IF_CELL_BYTES = 24 # Per student and candidate: overall score, product of one component, boundary position
+
+
+# Method to parse date of birth strings into a datetime64 array
+def parse_dobs(dobs):
+    try:
+        return np.array(dobs, dtype='datetime64[D]')
+    except ValueError: # Fall back to strptime for dates numpy does not accept, e.g. 2001-1-5
+        return np.array([datetime.strptime(d, "%Y-%m-%d").date() for d in dobs], dtype='datetime64[D]')
+
+
+# Method to calculate ages for an array of dates of birth - same rule as Student.calculate_age
+def calculate_ages(birth_dates, today=None):
+    today = today or datetime.now()
+    years = birth_dates.astype('datetime64[Y]')
+    months = birth_dates.astype('datetime64[M]')
+    birth_year = years.astype(np.int64) + 1970
+    birth_month = (months - years).astype(np.int64) + 1
+    birth_day = (birth_dates - months).astype(np.int64) + 1
+    not_had_birthday = (today.month * 100 + today.day) < (birth_month * 100 + birth_day)
+    return (today.year - birth_year - not_had_birthday).astype(np.int16)
+
+
+# Cohort grader class - grades the whole cohort in a few array operations
+class CohortGrader:
+
+    # Initializing the array form of a GradingTable
+    def __init__(self, grader):
+        self.boundaries = np.asarray(grader.boundaries, dtype=np.int16)
+        self.midpoints = np.asarray(grader.midpoints, dtype=np.float64)
+        self.category_names = grader.category_names # Category code = position in this tuple
+        self.boundary_codes = np.array([self.category_names.index(c) for c in grader.categories], dtype=np.int8)
+
+    # Method to calculate overall scores - column by column so the sums match Student.calculate_overall_score
+    def overall_scores(self, scores, weights):
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.size == 0:
+            scores = scores.reshape(0, len(weights))
+        if scores.ndim != 2 or scores.shape[1] != len(weights):
+            raise ValueError("The number of scores and weights must match.")
+        overall = np.zeros(scores.shape[0], dtype=np.float64)
+        for column, weight in enumerate(weights):
+            overall += scores[:, column] * weight
+        return overall
+
+    # Method to round overall scores - returns (rounded, category codes)
+    def round_scores(self, overall):
+        index = np.searchsorted(self.midpoints, overall, side='left') # Same tie-breaking as bisect_left
+        return self.boundaries[index], self.boundary_codes[index]
+
+    # Method to grade a cohort under many candidate weight vectors - returns (category counts, means, medians), one
+    # row per candidate. Candidates are graded a block at a time in buffers reused across blocks, so the working arrays
+    # stay within `memory` bytes, and each overall score is summed in the same order as overall_scores, so it rounds
+    # exactly as a re-grade would.
+    def evaluate(self, scores, weight_matrix, memory=DEFAULT_WHAT_IF_MEMORY):
+        scores = np.asarray(scores, dtype=np.float64)
+        weight_matrix = np.atleast_2d(np.asarray(weight_matrix, dtype=np.float64))
+        if scores.ndim != 2 or scores.shape[1] != weight_matrix.shape[1]:
+            raise ValueError("The number of scores and weights must match.")
+        if not len(scores):
+            raise ValueError("No student data available.")
+        students, candidates = len(scores), len(weight_matrix)
+        categories = len(self.category_names)
+        block = max(1, min(candidates, memory // (students * WHAT_IF_CELL_BYTES)))
+
+        counts = np.zeros((candidates, categories), dtype=np.int64)
+        means = np.empty(candidates, dtype=np.float64)
+        medians = np.empty(candidates, dtype=np.float64)
+        overall_buffer = np.empty(students * block, dtype=np.float64) # Flat, so a smaller last block is still contiguous
+        product_buffer = np.empty(students * block, dtype=np.float64)
+        code_lookup = self.boundary_codes.astype(np.int64) # Codes written over the boundary positions in place
+        for start in range(0, candidates, block):
+            weights = weight_matrix[start:start + block] # (candidates in block, components)
+            cells = students * len(weights)
+            overall = overall_buffer[:cells].reshape(students, len(weights))
+            product = product_buffer[:cells].reshape(students, len(weights))
+            overall.fill(0.0)
+            for column in range(scores.shape[1]):
+                np.multiply(scores[:, column, None], weights[None, :, column], out=product)
+                overall += product
+            codes = np.searchsorted(self.midpoints, overall, side='left')
+            np.take(code_lookup, codes, out=codes, mode='clip') # Positions are always in range; 'raise' would buffer a copy
+            codes += np.arange(len(weights)) * categories # One histogram per candidate from a single bincount
+            counts[start:start + len(weights)] = np.bincount(codes.ravel(),
+                                                             minlength=len(weights) * categories).reshape(-1, categories)
+            del codes # Freed before the next block's positions are allocated
+            means[start:start + len(weights)] = overall.mean(axis=0)
+            medians[start:start + len(weights)] = np.median(overall, axis=0, overwrite_input=True)
+        return counts, means, medians
+
+    # Method to grade a cohort - returns (overall, rounded, codes, ages)
+    def grade(self, scores, weights, dobs=None, today=None):
+        overall = self.overall_scores(scores, weights)
+        rounded, codes = self.round_scores(overall)
+        ages = calculate_ages(parse_dobs(dobs), today) if dobs is not None else None
+        return overall, rounded, codes, ages
+
+
+# LRU cache class - keeps the most recently used entries, up to maxsize
+class LRUCache:
+
+    # Initializing an empty cache
+    def __init__(self, maxsize=8):
+        if maxsize <= 0:
+            raise ValueError("Cache size must be a positive integer.")
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    # Method to get an entry and mark it as recently used
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    # Method to add an entry, evicting the least recently used one when full
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Cohort store class - columnar storage of a graded cohort, keyed by student ID
+class CohortStore(MutableMapping):
+
+    # Initializing empty typed columns
+    def __init__(self, category_names, student_factory, id_format="{:02d}"):
+        self.category_names = list(category_names) # Category code = position in this list
+        self.category_codes = {name: code for code, name in enumerate(self.category_names)}
+        self.student_factory = student_factory
+        self.id_format = id_format
+        self._analytics = CohortAnalytics() # Kept up to date on every insert, keyed by category code
+        self.version = 0 # Bumped whenever students or raw scores change, used as a cache key
+        self.clear()
+
+    # Method to reset the store to zero students
+    def clear(self):
+        self.version += 1
+        self.size = 0
+        self.capacity = 0
+        self.width = None # Number of scores per student, fixed by the first insert
+        self.strings = [] # Interned names and dates of birth
+        self.string_codes = {}
+        self._index = {} # ID number (ID text for IDs that are not numbers) -> row
+        self.id_labels = {} # Row -> ID text, only where it differs from id_format
+        self.id_column = np.empty(0, dtype=np.int64)
+        self.overall_column = np.empty(0, dtype=np.float64)
+        self.rounded_column = np.empty(0, dtype=np.int16)
+        self.age_column = np.empty(0, dtype=np.int16)
+        self.code_column = np.empty(0, dtype=np.int8)
+        self.name_column = np.empty(0, dtype=np.int32)
+        self.dob_column = np.empty(0, dtype=np.int32)
+        self.score_buffer = np.empty((0, 0), dtype=np.float64)
+        self._analytics.clear()
+        self.analytics_stale = False
+        self.queries = None # Score index for the query methods, built on first query and then kept up to date
+
+    # Method to use existing columns, e.g. views over a memory-mapped snapshot - nothing is copied until the store grows
+    def attach(self, columns, strings, id_labels=None):
+        self.clear()
+        self.id_column = columns['id']
+        self.overall_column = columns['overall']
+        self.rounded_column = columns['rounded']
+        self.age_column = columns['age']
+        self.code_column = columns['code']
+        self.name_column = columns['name']
+        self.dob_column = columns['dob']
+        self.score_buffer = columns['scores']
+        self.size = self.capacity = len(self.id_column)
+        self.width = self.score_buffer.shape[1]
+        self.strings = strings
+        self.id_labels = dict(id_labels or {})
+        # The lookup dicts and analytics are rebuilt on first use
+        self.string_codes = None
+        self._index = None
+        self.analytics_stale = True
+
+    # ID index, built on first use after attach
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = dict(zip(self.ids.tolist(), range(self.size)))
+            self._index.pop(-1, None)
+            for row, label in self.id_labels.items():
+                if self.id_column[row] < 0:
+                    self._index[label] = row
+        return self._index
+
+    # Running analytics, rebuilt from the columns on first use after attach
+    @property
+    def analytics(self):
+        if self.analytics_stale:
+            self._analytics.clear()
+            self._analytics.extend(self.overall.tolist(), self.codes.tolist())
+            self.analytics_stale = False
+        return self._analytics
+
+    # Score index, built from the columns on first use - inserts keep it up to date from then on
+    @property
+    def query_index(self):
+        if self.queries is None:
+            self.queries = ScoreIndex()
+            self.queries.extend(self.overall.tolist(), self.codes.tolist(), 0)
+        return self.queries
+
+    # Column views over the filled rows
+    @property
+    def ids(self):
+        return self.id_column[:self.size]
+
+    @property
+    def overall(self):
+        return self.overall_column[:self.size]
+
+    @property
+    def rounded(self):
+        return self.rounded_column[:self.size]
+
+    @property
+    def ages(self):
+        return self.age_column[:self.size]
+
+    @property
+    def codes(self):
+        return self.code_column[:self.size]
+
+    @property
+    def scores(self):
+        return self.score_buffer[:self.size]
+
+    # Method to make room for more rows - capacity doubles so appends are amortised O(1)
+    def reserve(self, rows, width):
+        if self.width is None:
+            self.width = width
+            self.score_buffer = np.empty((self.capacity, width), dtype=np.float64)
+        elif width != self.width:
+            raise ValueError("The number of scores and weights must match.")
+        needed = self.size + rows
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 16)
+        for attr in ('id_column', 'overall_column', 'rounded_column', 'age_column',
+                     'code_column', 'name_column', 'dob_column', 'score_buffer'):
+            old = getattr(self, attr)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+        self.capacity = capacity
+
+    # Method to intern a string - returns its code
+    def intern(self, value):
+        if self.string_codes is None: # Attached string table - make it a list we can append to
+            self.strings = list(self.strings)
+            self.string_codes = {string: code for code, string in enumerate(self.strings)}
+        code = self.string_codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.string_codes[value] = code
+        return code
+
+    # Method to get the code for a category name, adding unknown names such as 'Ungraded'
+    def category_code(self, category):
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_codes[category] = code
+        return code
+
+    # Method to get the number stored in the ID column - -1 for IDs that are not numbers, which keep their text label
+    def id_number(self, student_id):
+        try:
+            number = int(student_id)
+        except ValueError:
+            return -1
+        return number if number >= 0 else -1
+
+    # Method to get the index key of an ID - its number, so '7' and '07' are the same student
+    def key(self, student_id):
+        number = self.id_number(student_id)
+        return student_id if number < 0 else number
+
+    # Method to get the ID text of a row
+    def student_id(self, row):
+        label = self.id_labels.get(row)
+        if label is None:
+            return self.id_format.format(int(self.id_column[row]))
+        return label
+
+    # Method to get the name, date of birth and category of a row
+    def name(self, row):
+        return self.strings[self.name_column[row]]
+
+    def dob(self, row):
+        return self.strings[self.dob_column[row]]
+
+    def category(self, row):
+        return self.category_names[self.code_column[row]]
+
+    # Method to write one row
+    def write_row(self, row, student_id, name, dob, scores, overall, rounded, code, age):
+        self.version += 1
+        key = self.id_number(student_id)
+        self.id_column[row] = key
+        if self.id_format.format(key) != student_id:
+            self.id_labels[row] = student_id
+        else:
+            self.id_labels.pop(row, None)
+        self.name_column[row] = self.intern(name)
+        self.dob_column[row] = self.intern(dob)
+        self.score_buffer[row] = scores
+        self.overall_column[row] = overall
+        self.rounded_column[row] = rounded
+        self.code_column[row] = code
+        self.age_column[row] = age
+        self.index[student_id if key < 0 else key] = row
+
+    # Method to append or replace a graded student
+    def add(self, stu):
+        analytics = self.analytics # Bring stale analytics up to date before the columns change
+        row = self.index.get(self.key(stu.student_id))
+        if row is None:
+            self.reserve(1, len(stu.scores))
+            row = self.size
+            self.size += 1
+        elif len(stu.scores) != self.width:
+            raise ValueError("The number of scores and weights must match.")
+        else: # Replacing a student - take the old one out of the analytics and the score index
+            analytics.remove(float(self.overall_column[row]), int(self.code_column[row]))
+            if self.queries is not None:
+                self.queries.remove(float(self.overall_column[row]), int(self.code_column[row]), row)
+        code = self.category_code(stu.category)
+        self.write_row(row, stu.student_id, stu.name, stu.dob, stu.scores, stu.overall,
+                       stu.rounded, code, stu.age)
+        analytics.add(float(stu.overall), code)
+        if self.queries is not None:
+            self.queries.add(float(self.overall_column[row]), code, row)
+
+    # Method to append graded columns in bulk - IDs must not already be in the store
+    def extend(self, student_ids, names, dobs, scores, overall, rounded, codes, ages):
+        rows = len(student_ids)
+        if not rows: # e.g. every line of the file was rejected
+            return
+        analytics = self.analytics
+        self.version += 1
+        scores = np.asarray(scores, dtype=np.float64).reshape(rows, -1)
+        self.reserve(rows, scores.shape[1])
+        start, end = self.size, self.size + rows
+        keys = [self.id_number(sid) for sid in student_ids]
+        self.id_column[start:end] = keys
+        for row, (key, sid) in enumerate(zip(keys, student_ids), start):
+            if self.id_format.format(key) != sid:
+                self.id_labels[row] = sid
+            self.index[sid if key < 0 else key] = row
+        self.name_column[start:end] = [self.intern(n) for n in names]
+        self.dob_column[start:end] = [self.intern(d) for d in dobs]
+        self.score_buffer[start:end] = scores
+        self.overall_column[start:end] = overall
+        self.rounded_column[start:end] = rounded
+        self.code_column[start:end] = codes
+        self.age_column[start:end] = ages
+        self.size = end
+        overall, codes = self.overall_column[start:end].tolist(), self.code_column[start:end].tolist()
+        analytics.extend(overall, codes)
+        if self.queries is not None:
+            self.queries.extend(overall, codes, start)
+
+    # Method to replace the grades of every student, e.g. after a weight change - raw scores stay as they are
+    def set_grades(self, overall, rounded, codes):
+        self.overall_column[:self.size] = overall
+        self.rounded_column[:self.size] = rounded
+        self.code_column[:self.size] = codes
+        self.analytics_stale = True # Rebuilt from the new grades on first use
+        self.queries = None
+
+    # Method to build the Student view for a row
+    def materialize(self, row):
+        stu = self.student_factory(self.student_id(row), self.name(row), self.dob(row), self.score_buffer[row].tolist())
+        stu.age = int(self.age_column[row])
+        stu.overall = float(self.overall_column[row])
+        stu.rounded = int(self.rounded_column[row])
+        stu.category = self.category(row)
+        return stu
+
+    # Method to get the category histogram by name, in order of first appearance
+    def category_counts(self):
+        return {self.category_names[code]: count for code, count in self.analytics.category_counts.items()}
+
+    # Query methods - each touches only the students it returns, through the score index
+
+    # Method to get the students in any of the categories, lowest overall first
+    def in_categories(self, *categories):
+        codes = [self.category_codes[c] for c in categories if c in self.category_codes]
+        return [self.materialize(row) for row in self.query_index.in_categories(codes)]
+
+    # Method to get the k students with the highest overall scores, highest first
+    def top(self, k):
+        return [self.materialize(row) for row in self.query_index.top(k)]
+
+    # Method to get the k students with the lowest overall scores, lowest first
+    def bottom(self, k):
+        return [self.materialize(row) for row in self.query_index.top(k, lowest=True)]
+
+    # Method to get the students with low <= overall <= high, lowest first
+    def between(self, low, high):
+        return [self.materialize(row) for row in self.query_index.between(low, high)]
+
+    # Method to get the percentile rank (0-100) of a student within the cohort
+    def percentile_rank(self, student_id):
+        row = self.index[self.key(student_id)]
+        return self.query_index.percentile_rank(float(self.overall_column[row]))
+
+    # Method to get rows ordered by ID text - the order the summary table uses
+    def sorted_rows(self):
+        return sorted(range(self.size), key=self.student_id)
+
+    # Method to iterate over rows as plain tuples - (id, name, dob, age, overall, rounded, category)
+    def iter_rows(self, rows=None):
+        strings, names = self.strings, self.category_names
+        name_column, dob_column = self.name_column, self.dob_column
+        overall, rounded = self.overall_column.tolist(), self.rounded_column.tolist()
+        ages, codes = self.age_column.tolist(), self.code_column.tolist()
+        for row in (range(self.size) if rows is None else rows):
+            yield (self.student_id(row), strings[name_column[row]], strings[dob_column[row]],
+                   ages[row], overall[row], rounded[row], names[codes[row]])
+
+    def __getitem__(self, student_id):
+        return self.materialize(self.index[self.key(student_id)])
+
+    def __setitem__(self, student_id, stu):
+        if student_id != stu.student_id:
+            raise ValueError("Student ID does not match the key.")
+        self.add(stu)
+
+    def __delitem__(self, student_id):
+        row = self.index[self.key(student_id)]
+        self.version += 1
+        self.analytics.remove(float(self.overall_column[row]), int(self.code_column[row]))
+        # Shift the later rows up so insertion order is kept
+        for attr in ('id_column', 'overall_column', 'rounded_column', 'age_column',
+                     'code_column', 'name_column', 'dob_column', 'score_buffer'):
+            column = getattr(self, attr)
+            column[row:self.size - 1] = column[row + 1:self.size]
+        self.size -= 1
+        self.queries = None # Rows have moved - rebuilt on the next query
+        self.id_labels = {r - (r > row): label for r, label in self.id_labels.items() if r != row}
+        self._index = {key: r - (r > row) for key, r in self.index.items() if r != row}
+
+    def __contains__(self, student_id):
+        return self.key(student_id) in self.index
+
+    def __iter__(self):
+        return (self.student_id(row) for row in range(self.size)) # Row order is insertion order
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,242 @@
+"""
+Categorical Marking System - Core
+The grading pieces on their own - mark boundaries and categories, the grading table, student ID format,
+Student, ModuleConfig and the field validators. Only the standard library is imported, so short-lived jobs
+that just grade students start quickly; program.py builds the full system on top.
+"""
+# Necessary Imports
+import logging
+from bisect import bisect_left
+from datetime import datetime
+
+# Lists for possible marks
+category_marks_lists = (0, 5, 15, 25, 32, 35, 38,
+                        42, 45, 48, 52, 55, 58,
+                        62, 65, 68, 72, 75, 78,
+                        82, 85, 92, 100)
+
+# Categories dictionary to determine category
+categories = {
+    "Aurum Standard": [100],
+    "Upper First": [82, 85, 92],
+    "First": [72, 75, 78],
+    "2:1": [62, 65, 68],
+    "2:2": [52, 55, 58],
+    "Third": [42, 45, 48],
+    "Condonable Fail": [32, 35, 38],
+    "Fail": [25, 15, 5],
+    "Defecit Opus": [0]
+}
+
+# Grading table class - precomputed lookups built once from the boundaries and categories
+class GradingTable:
+
+    # Initializing the midpoint index and the boundary to category reverse map
+    def __init__(self, boundaries, category_map):
+        self.boundaries = tuple(sorted(boundaries))
+        # Midpoints between neighbouring boundaries, searched with bisect
+        self.midpoints = tuple((lo + hi) / 2 for lo, hi in zip(self.boundaries, self.boundaries[1:]))
+        self.boundary_categories = {}
+        for category, values in category_map.items():
+            for value in values:
+                self.boundary_categories.setdefault(value, category) # First category listing a boundary wins, as in the dict walk
+        # Category for each boundary position, so grading never touches the dict
+        self.categories = tuple(self.category_for(b) for b in self.boundaries)
+        self.category_names = tuple(dict.fromkeys(self.categories)) # Unique names, lowest category first
+
+    # Method to find the closest boundary - an exact midpoint goes to the lower boundary, like min()
+    def round_score(self, overall):
+        return self.boundaries[bisect_left(self.midpoints, overall)]
+
+    # Method to determine category of a boundary
+    def category_for(self, boundary):
+        if boundary < 0 or boundary > 100:
+            return 'Ungraded' # Return ungraded if out of bound
+        return self.boundary_categories.get(boundary, 'Ungraded')
+
+    # Method to grade an overall score - returns (rounded, category)
+    def grade(self, overall):
+        index = bisect_left(self.midpoints, overall)
+        return self.boundaries[index], self.categories[index]
+
+# Shared grading table used by students and file processing
+grading_table = GradingTable(category_marks_lists, categories)
+
+# Student ID format class - IDs are numbers of up to `digits` digits, stored as integers and shown zero-padded
+class IdFormat:
+
+    # Initializing the format for a number of digits
+    def __init__(self, digits=2):
+        if digits < 1:
+            raise ValueError("Student IDs need at least one digit.")
+        self.digits = digits
+        self.maximum = 10 ** digits - 1
+        self.template = f"{{:0{digits}d}}" # Format string used by CohortStore
+        self.error = f"ID must be a {digits}-digit number."
+
+    # Method to get the number of an ID - raises ValueError for anything that is not up to `digits` digits
+    def number(self, student_id):
+        stripped_id = student_id.lstrip('0') or '0'
+        if not stripped_id.isdigit() or int(stripped_id) > self.maximum:
+            raise ValueError(self.error)
+        return int(stripped_id)
+
+    # Method to get the canonical text of an ID, so '7' and '07' are the same student
+    def canonical(self, student_id):
+        return self.template.format(self.number(student_id))
+
+# Student class
+class Student:
+    __slots__ = ('student_id', 'name', 'dob', 'scores', 'age', 'overall', 'rounded', 'category')
+
+    # Initializing necessary attributes
+    def __init__(self, student_id, name, dob, scores):
+        self.student_id = student_id
+        self.name = name
+        self.dob = dob
+        self.scores = scores
+        self.age = 0
+        self.overall = 0
+        self.rounded = 0
+        self.category = ""
+
+    # Method to calculate age
+    def calculate_age(self):
+        birth_date = datetime.strptime(self.dob, "%Y-%m-%d")
+        today = datetime.now()
+        self.age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+    # Method to calculate overall score
+    def calculate_overall_score(self, weights):
+        if len(self.scores) != len(weights): # Return an error if there if number of scores provided are not equals to number of weights
+            raise ValueError("The number of scores and weights must match.")
+        self.overall = sum(s * w for s, w in zip(self.scores, weights))
+
+    # Method to round the score to category
+    def round_to_category(self, grader=None):
+        self.rounded, self.category = (grader or grading_table).grade(self.overall)
+
+    # Method to determine category
+    def determine_category(self, boundary, grader=None):
+        return (grader or grading_table).category_for(boundary)
+
+# Module Configuration Class
+class ModuleConfig:
+    
+    # Initialize configuration list
+    def __init__(self):
+        self.module_configuration = {}  # e.g. {"Coursework1": 0.2, "Coursework2": 0.3, ...}
+        self.module_name = None # Used as the module key in a cohort repository
+
+    # Middleware method to ask for custom module setup
+    def setup_module(self):
+        if not self.ask_for_custom_configuration(): # Ask for confirmation
+            return # Return to main if no
+
+        self.module_name = input("Enter module name: ").strip() or None
+        self.configure_module() # Call method to configure module
+
+    # Method to ask for custom module config
+    def ask_for_custom_configuration(self):
+        while True:
+            choice = input("Would you like to setup custom module configuration? (y/n): ").lower()
+            if choice in ["n", "no"]:
+                print("\n")
+                return False
+            elif choice in ["y", "yes"]:
+                return True
+            print("Invalid choice. Please enter 'y' or 'n'.")
+
+    # Method to configure module
+    def configure_module(self):
+        while True:
+            try:
+                num_components = self.get_number_of_components() # get the number of component
+                self.module_configuration.clear() # Clear any previous module config to avoid issues
+                total_weight = self.get_component_weights(num_components) # Get component weights based on the number of components
+
+                if abs(total_weight - 100) > 0.01: # Check if the weights add up to 100%
+                    print("Weights must sum to 100%. Please try again.")
+                    continue
+                
+                print("Module configuration complete.")
+                return
+            except ValueError:
+                logging.error("Entered an invalid integer.")
+                print("Please enter a valid integer for the number of components.")
+
+    # Method to get the number of components
+    def get_number_of_components(self):
+        while True:
+            try:
+                num_components = int(input("How many assessment components does this module have? "))
+                if num_components <= 0:
+                    print("Number of components must be a positive integer.")
+                    continue
+                return num_components
+            except ValueError:
+                logging.error("Invalid number of components.")
+                print("Invalid input. Please enter a valid integer.")
+
+    # Method to get component weights
+    def get_component_weights(self, num_components):
+        total_weight = 0
+        for i in range(num_components):
+            while True:
+                try:
+                    comp_name = input(f"Component {i+1} name: ").strip()
+                    if not comp_name:
+                        print("Component name cannot be empty.")
+                        continue
+                    weight = float(input(f"Enter {i+1} weight (%): "))
+                    if weight <= 0 or weight > 100:
+                        print("Weight must be between 0 and 100.")
+                        continue
+                    self.module_configuration[comp_name] = weight / 100
+                    total_weight += weight
+                    break
+                except ValueError:
+                    logging.error("Invalid number of weights.")
+                    print("Invalid input. Please try again.")
+        return total_weight
+
+    # Method to configure the module without prompts - weights are percentages summing to 100
+    def set_weights(self, weights, names=None):
+        names = list(names) if names else [f"Component {i+1}" for i in range(len(weights))]
+        if not weights or len(names) != len(weights):
+            raise ValueError("Each component needs exactly one weight.")
+        if any(w <= 0 or w > 100 for w in weights):
+            raise ValueError("Weight must be between 0 and 100.")
+        if abs(sum(weights) - 100) > 0.01:
+            raise ValueError("Weights must sum to 100%.")
+        self.module_configuration = {name: weight / 100 for name, weight in zip(names, weights)}
+
+    # Method to record the fractional weights a cohort was re-graded with - component names are kept when the number
+    # of components is unchanged
+    def replace_weights(self, weights):
+        names = list(self.module_configuration)
+        if len(names) != len(weights):
+            names = [f"Component {i+1}" for i in range(len(weights))]
+        self.module_configuration = {name: float(weight) for name, weight in zip(names, weights)}
+
+    # Return the usual four weights if no configuration is available - helper method
+    def get_weights(self):
+        if self.module_configuration:
+            return list(self.module_configuration.values())
+        return [0.1, 0.2, 0.3, 0.4]  # default
+
+# Validation functions - shared by the interactive prompts and anything else checking single fields
+def validate_name(user_input):
+    if not all(c.isalpha() or c.isspace() for c in user_input):
+        raise ValueError("Name should contain only letters and spaces.")
+    return user_input
+
+def validate_dob(user_input):
+    datetime.strptime(user_input, '%Y-%m-%d')
+    return user_input
+
+def validate_score(user_input):
+    score = float(user_input)
+    if not 0 <= score <= 100:
+        raise ValueError("Score must be between 0 and 100")
+    return score
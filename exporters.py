@@ -0,0 +1,101 @@
+"""
+Categorical Marking System - Exporters
+Streaming export of graded cohorts to CSV or JSON Lines, optionally gzip-compressed.
+"""
+# Necessary Imports
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+
+HEADERS = ['ID', 'Name', 'DOB', 'Age', 'Overall', 'Rounded', 'Category']
+DEFAULT_EXPORT_BATCH = 10000 # Rows formatted and written at a time
+WRITE_BUFFER = 1 << 20 # Bytes buffered before each write to disk
+
+
+# CSV exporter class - same columns and number format as the original students.csv
+class CsvExporter:
+    extension = '.csv'
+
+    # Initializing the writer on an open text stream
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+
+    def write_header(self):
+        self.writer.writerow(HEADERS)
+
+    # Method to write a batch of (id, name, dob, age, overall, rounded, category) rows
+    def write_rows(self, rows):
+        self.writer.writerows([(sid, name, dob, age, f"{overall:.2f}", rounded, category)
+                               for sid, name, dob, age, overall, rounded, category in rows])
+
+
+# JSON Lines exporter class - one object per student, overall kept at full precision
+class JsonLinesExporter:
+    extension = '.jsonl'
+
+    # Initializing the exporter on an open text stream
+    def __init__(self, stream):
+        self.stream = stream
+        self.encoder = json.JSONEncoder(ensure_ascii=False)
+
+    def write_header(self):
+        pass # Every line describes itself
+
+    # Method to write a batch of rows
+    def write_rows(self, rows):
+        encode = self.encoder.encode
+        self.stream.write(''.join(
+            encode({'id': sid, 'name': name, 'dob': dob, 'age': age, 'overall': overall,
+                    'rounded': rounded, 'category': category}) + '\n'
+            for sid, name, dob, age, overall, rounded, category in rows))
+
+
+# Available formats - add an exporter class here to support a new one
+EXPORTERS = {
+    'csv': CsvExporter,
+    'jsonl': JsonLinesExporter,
+}
+
+
+# Method to work out the format and compression from a path like students.jsonl.gz
+def detect_format(path):
+    name = str(path).lower()
+    compress = name.endswith('.gz')
+    if compress:
+        name = name[:-3]
+    for fmt, exporter in EXPORTERS.items():
+        if name.endswith(exporter.extension):
+            return fmt, compress
+    return 'csv', compress
+
+
+# Method to open the output file with a large write buffer, through gzip when compressing
+def open_output(path, compress):
+    if compress:
+        raw = gzip.open(path, 'wb', compresslevel=6)
+        return io.TextIOWrapper(io.BufferedWriter(raw, WRITE_BUFFER), encoding='utf-8', newline='')
+    return open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER)
+
+
+# Method to stream rows to a file in batches - returns the number of rows written
+def export_rows(rows, path, fmt=None, compress=None, batch_size=DEFAULT_EXPORT_BATCH):
+    detected, detected_compress = detect_format(path)
+    fmt = fmt or detected
+    compress = detected_compress if compress is None else compress
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    written = 0
+    rows = iter(rows)
+    with open_output(path, compress) as stream:
+        exporter = EXPORTERS[fmt](stream)
+        exporter.write_header()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            exporter.write_rows(batch)
+            written += len(batch)
+    return written
@@ -0,0 +1,208 @@
+"""
+Categorical Marking System - Ingestion helpers
+Generators for reading mark files in bounded memory, opening and expanding (compressed) inputs, and a tail reader
+for files that keep growing.
+"""
+# Necessary Imports
+import glob
+import importlib
+import locale
+import os
+import queue
+import threading
+
+# Default sizes for streaming ingestion
+DEFAULT_BLOCK_SIZE = 1 << 20 # Characters read from the file at a time
+DEFAULT_BATCH_SIZE = 1000 # Records emitted per batch
+DEFAULT_CHECKPOINT_LINES = 500000 # Lines read between checkpoints in resumable mode
+DEFAULT_INPUT_PATTERNS = ('*.txt', '*.txt.gz', '*.txt.bz2', '*.txt.xz') # Files picked up inside a directory
+PREFETCH_DEPTH = 4 # Blocks read ahead of the parser
+TAIL_HEAD_SIZE = 4096 # Leading bytes compared on every poll to notice a file rewritten in place
+
+
+# Generator to read lines from a file in fixed-size blocks - lines are yielded without the newline
+def iter_lines(f, block_size=DEFAULT_BLOCK_SIZE):
+    pending = [] # Pieces of a line that spans more than one block
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        lines = block.split('\n')
+        if len(lines) == 1: # No newline in this block
+            pending.append(block)
+            continue
+        if pending:
+            pending.append(lines[0])
+            lines[0] = ''.join(pending)
+            pending = []
+        tail = lines.pop()
+        if tail:
+            pending.append(tail)
+        yield from lines
+    if pending: # Last line without a trailing newline
+        yield ''.join(pending)
+
+
+# Decompression modules by file suffix, imported on first use - inputs with any other suffix are read as plain text
+COMPRESSED_OPENERS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'lzma',
+}
+
+
+# Method to check whether an input is compressed
+def is_compressed(filename):
+    return os.path.splitext(str(filename))[1].lower() in COMPRESSED_OPENERS
+
+
+# Method to open an input as text, decompressing .gz, .bz2 and .xz on the fly
+def open_input(filename, encoding=None):
+    module = COMPRESSED_OPENERS.get(os.path.splitext(str(filename))[1].lower())
+    if module is None:
+        return open(filename, 'r', encoding=encoding)
+    return importlib.import_module(module).open(filename, 'rt', encoding=encoding or locale.getpreferredencoding(False))
+
+
+# Method to expand files, globs and directories into a list of files - directories and globs are sorted, the order
+# of the arguments is kept and repeats are dropped, so duplicates across files are always resolved the same way
+def expand_inputs(inputs, pattern=None):
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    patterns = DEFAULT_INPUT_PATTERNS if pattern is None else ((pattern,) if isinstance(pattern, str) else tuple(pattern))
+    files = []
+    for item in map(str, inputs):
+        if os.path.isdir(item):
+            files.extend(sorted(name for p in patterns for name in glob.glob(os.path.join(item, p))))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item)))
+        else:
+            files.append(item)
+    return list(dict.fromkeys(files))
+
+
+# Reader class - reads (and decompresses) blocks on a background thread, so decompression overlaps with parsing.
+# gzip, bz2 and lzma release the GIL while they work.
+class PrefetchReader:
+
+    # Initializing the reader and starting the background thread
+    def __init__(self, f, block_size=DEFAULT_BLOCK_SIZE, depth=PREFETCH_DEPTH):
+        self.f = f
+        self.block_size = block_size
+        self.blocks = queue.Queue(depth)
+        self.done = False
+        threading.Thread(target=self.fill, daemon=True).start()
+
+    # Method run by the background thread - an error is handed over to be raised by read
+    def fill(self):
+        try:
+            while True:
+                block = self.f.read(self.block_size)
+                self.blocks.put(block)
+                if not block:
+                    break
+        except Exception as e:
+            self.blocks.put(e)
+
+    # Method to get the next block, whatever size is asked for - empty at the end of the file
+    def read(self, size=-1):
+        if self.done:
+            return self.f.read(0)
+        block = self.blocks.get()
+        if isinstance(block, Exception):
+            raise block
+        if not block:
+            self.done = True
+        return block
+
+
+# Generator to group items into lists of at most batch_size
+def iter_batches(items, batch_size=DEFAULT_BATCH_SIZE):
+    if batch_size <= 0:
+        raise ValueError("Batch size must be a positive integer.")
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Generator to read complete lines from a binary file in blocks - yields (lines, offset just after them), so a reader
+# can record exactly where to carry on
+def iter_line_blocks(f, block_size=DEFAULT_BLOCK_SIZE, encoding=None):
+    encoding = encoding or locale.getpreferredencoding(False)
+    offset = f.tell()
+    pending = b'' # Start of a line that continues in the next block
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        data = pending + block
+        end = data.rfind(b'\n') + 1
+        if not end:
+            pending = data
+            continue
+        pending = data[end:]
+        offset += end
+        lines = data[:end].decode(encoding).split('\n')
+        lines.pop() # Empty piece after the last newline
+        yield lines, offset
+    if pending: # Last line without a trailing newline
+        yield [pending.decode(encoding)], offset + len(pending)
+
+
+# Method to split a file into byte ranges that start and end on line boundaries
+def line_aligned_ranges(filename, chunks):
+    if chunks <= 0:
+        raise ValueError("Number of chunks must be a positive integer.")
+    with open(filename, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        offsets = [0]
+        for i in range(1, chunks):
+            target = max(size * i // chunks, offsets[-1])
+            if target >= size:
+                break
+            if target == 0: # More chunks than bytes - the first range starts here anyway
+                continue
+            f.seek(target - 1)
+            f.readline() # Move to the start of the next full line
+            offsets.append(f.tell())
+        offsets.append(size)
+    # Drop empty ranges that appear when lines are longer than a chunk
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+
+
+# File tail class - remembers how far a file has been read, so each poll returns only the newly appended lines
+class FileTail:
+
+    # Initializing the tail at the start of the file
+    def __init__(self, filename, encoding=None):
+        self.filename = filename
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.identity = None # (device, inode) of the file that was read
+        self.offset = 0 # Byte offset just after the last complete line read
+        self.head = b'' # Leading bytes already read, to spot a rewrite that keeps the inode
+
+    # Method to read complete lines appended since the last poll - returns (reset, lines). reset is True when the file
+    # was replaced, truncated or rewritten, in which case lines start again from the beginning of the file. A last line
+    # without its newline is left for a later poll.
+    def read_new_lines(self):
+        with open(self.filename, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            head = f.read(TAIL_HEAD_SIZE)
+            reset = identity != self.identity or stat.st_size < self.offset or not head.startswith(self.head)
+            if reset:
+                self.identity, self.offset = identity, 0
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        self.head = head[:min(self.offset, TAIL_HEAD_SIZE)]
+        lines = data[:end].decode(self.encoding).split('\n')
+        lines.pop() # Empty piece after the last newline
+        return reset, lines
@@ -0,0 +1,130 @@
+"""
+Categorical Marking System - Logging
+Queue-based logging, so formatting and file writes happen on a background thread, and aggregated
+rejection summaries, so a dirty file logs a few summary lines instead of one line per bad record.
+"""
+# Necessary Imports
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_LOG_FILE = 'cms.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s' # TIME, DATE - LEVEL - MESSAGE
+DEFAULT_SUMMARY_INTERVAL = 5.0 # Seconds between rejection summaries
+DEFAULT_SAMPLES = 3 # Example lines kept per reason and summary
+MAX_SAMPLE_LENGTH = 200 # Characters of an example line written to the log
+
+_listener = None # Background listener of this process, when queue logging is on
+_handlers = [] # Handlers the listener writes to, restored when queue logging stops
+_owner = None # Process that started the listener
+
+
+# Method to configure logging for an application - called by the entry points rather than on import, so importing
+# the marking system never opens a log file. Does nothing if the root logger already has handlers.
+def configure_logging(filename=DEFAULT_LOG_FILE, level=logging.INFO):
+    logging.basicConfig(level=level, format=LOG_FORMAT, filename=filename, filemode='a')
+
+
+# Method to move the root logger's handlers behind a queue - returns the listener
+def start_queue_logging(logger=None):
+    global _listener, _handlers, _owner
+    if _listener is not None:
+        return _listener
+    logger = logger or logging.getLogger()
+    _handlers = list(logger.handlers)
+    log_queue = queue.SimpleQueue()
+    for handler in _handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    _owner = os.getpid()
+    atexit.register(stop_queue_logging)
+    return _listener
+
+
+# Method to write out everything still queued and put the original handlers back
+def stop_queue_logging(logger=None):
+    global _listener, _owner
+    if _listener is None:
+        return
+    logger = logger or logging.getLogger()
+    if _owner == os.getpid(): # A forked child has no listener thread to stop
+        _listener.stop()
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
+    for handler in _handlers:
+        logger.addHandler(handler)
+    _listener = _owner = None
+
+
+# Method to describe where this process logs, for worker processes - (log file, level), or None without a log file
+def log_settings(logger=None):
+    logger = logger or logging.getLogger()
+    handlers = _handlers if _listener is not None else logger.handlers # Behind the queue when queue logging is on
+    for handler in handlers:
+        if isinstance(handler, logging.FileHandler):
+            return handler.baseFilename, logger.level
+    return None
+
+
+# Method for worker processes - a forked child inherits the queue but not the listener, so it logs directly. A spawned
+# child inherits no handlers at all, so it opens the parent's log file from settings (see log_settings).
+def direct_logging_in_worker(settings=None):
+    if _listener is not None and _owner != os.getpid():
+        stop_queue_logging()
+    if settings is not None and not logging.getLogger().handlers:
+        configure_logging(*settings)
+
+
+# Rejection log class - counts rejected lines per reason and logs a summary at most once per interval
+class RejectionLog:
+
+    # Initializing the log - samples example lines are kept per reason for each summary
+    def __init__(self, interval=DEFAULT_SUMMARY_INTERVAL, samples=DEFAULT_SAMPLES, logger=None):
+        self.interval = interval
+        self.samples = samples
+        self.logger = logger or logging.getLogger()
+        self.lock = threading.Lock()
+        self.counts = {} # Reason -> lines rejected since the last summary
+        self.examples = {} # Reason -> [(message, line)]
+        self.total = 0
+        self.last_summary = time.monotonic()
+
+    # Method to count one rejected line - logs a summary if the interval has passed
+    def record(self, reason, message, line=None):
+        with self.lock:
+            self.counts[reason] = self.counts.get(reason, 0) + 1
+            self.total += 1
+            examples = self.examples.setdefault(reason, [])
+            if len(examples) < self.samples:
+                examples.append((message, line))
+            now = time.monotonic()
+            if now - self.last_summary < self.interval:
+                return
+            pending = self.take(now)
+        self.write(*pending)
+
+    # Method to log whatever has not been summarised yet, e.g. at the end of a run
+    def flush(self):
+        with self.lock:
+            pending = self.take(time.monotonic())
+        self.write(*pending)
+
+    # Method to take the counts and examples of the current window - call with the lock held
+    def take(self, now):
+        pending = (self.counts, self.examples, now - self.last_summary)
+        self.counts, self.examples = {}, {}
+        self.last_summary = now
+        return pending
+
+    # Method to write one summary record per reason, outside the lock
+    def write(self, counts, examples, seconds):
+        for reason, count in counts.items():
+            shown = '; '.join(message if line is None else f"{message} [line: {line.strip()[:MAX_SAMPLE_LENGTH]!r}]"
+                              for message, line in examples.get(reason, ()))
+            self.logger.warning(f"Rejected {count} lines ({reason}) in the last {seconds:.1f}s, e.g. {shown}")
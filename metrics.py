@@ -0,0 +1,139 @@
+"""
+Categorical Marking System - Metrics
+Stage timers, rejection counters, peak memory and throttled progress for ingestion runs.
+"""
+# Necessary Imports
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+STAGES = ('read', 'parse', 'validate', 'grade', 'merge', 'export')
+REJECTION_REASONS = ('parts', 'id', 'name', 'dob', 'score', 'duplicate', 'error')
+
+
+# Method to get the peak resident memory of this process in bytes - None where it is not available
+def peak_memory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # Linux reports kilobytes
+
+
+# Progress reporter class - prints at most once per interval instead of once per record
+class ProgressReporter:
+
+    # Initializing the reporter - total may be None when the size is not known up front
+    def __init__(self, total=None, interval=0.5, stream=None, enabled=True):
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.enabled = enabled
+        self.done = 0
+        self.started = time.perf_counter()
+        self.last_report = 0.0
+        self.lock = threading.Lock()
+
+    # Method to record finished records and print if the interval has passed
+    def update(self, count=1):
+        with self.lock:
+            self.done += count
+            now = time.perf_counter()
+            if self.enabled and now - self.last_report >= self.interval:
+                self.last_report = now
+                self.report(now)
+
+    # Method to print the current progress line
+    def report(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0
+        of_total = f"/{self.total}" if self.total is not None else ""
+        print(f"\rProgress: {self.done}{of_total} records processed ({rate:,.0f}/s)", end="", file=self.stream or sys.stdout)
+
+    # Method to print the final progress line
+    def finish(self):
+        if self.enabled:
+            self.report()
+
+
+# Ingestion metrics class - timers per stage, counters per rejection reason, peak memory
+class IngestionMetrics:
+
+    # Initializing empty metrics
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    # Method to clear every timer and counter
+    def reset(self):
+        with self.lock:
+            self.timers = dict.fromkeys(STAGES, 0.0)
+            self.rejected = dict.fromkeys(REJECTION_REASONS, 0)
+            self.lines = 0
+            self.accepted = 0
+            self.started = time.perf_counter()
+            self.finished = None
+
+    # Method to add time to a stage
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+
+    # Context manager to time a block as one stage
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    # Method to count a rejected line
+    def reject(self, reason, count=1):
+        with self.lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + count
+
+    # Method to merge counters from another process or parser
+    def merge(self, timers=None, rejected=None, lines=0):
+        with self.lock:
+            for stage, seconds in (timers or {}).items():
+                self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+            for reason, count in (rejected or {}).items():
+                self.rejected[reason] = self.rejected.get(reason, 0) + count
+            self.lines += lines
+
+    # Method to mark the end of a run
+    def finish(self, lines=None, accepted=None):
+        with self.lock:
+            if lines is not None:
+                self.lines = lines
+            if accepted is not None:
+                self.accepted = accepted
+            self.finished = time.perf_counter()
+
+    # Method to get every figure as a plain dict
+    def as_dict(self):
+        with self.lock:
+            elapsed = (self.finished or time.perf_counter()) - self.started
+            return {
+                'lines': self.lines,
+                'accepted': self.accepted,
+                'rejected': dict(self.rejected),
+                'rejected_total': sum(self.rejected.values()),
+                'timers': {stage: round(seconds, 6) for stage, seconds in self.timers.items()},
+                'elapsed': round(elapsed, 6),
+                'records_per_second': round(self.lines / elapsed, 1) if elapsed > 0 else None,
+                'peak_memory_bytes': peak_memory(),
+            }
+
+    # Method to write the metrics as JSON
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write('\n')
@@ -0,0 +1,194 @@
+"""
+Categorical Marking System - Notifications
+Concurrent email notifications over a bounded pool of reused SMTP connections.
+"""
+# Necessary Imports
+import logging
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from queue import Queue, Empty
+from string import Template
+
+# Result of one notification - sent is False when every attempt failed
+DeliveryResult = namedtuple('DeliveryResult', ['student_id', 'recipient', 'sent', 'attempts', 'error'])
+
+# Default message for failing students
+DEFAULT_SUBJECT = "Important: Course Performance Update"
+DEFAULT_BODY = """Dear $name - $student_id,
+                    This is to inform you about your current academic standing.
+                    Your overall score is $overall
+                    Category: $category
+
+                    Please contact your module leader for support.
+                    """
+
+# Errors that will not go away by trying again
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPAuthenticationError)
+
+
+# Message template class - the body template is parsed once and reused for every student
+class MessageTemplate:
+
+    # Initializing the cached template
+    def __init__(self, sender, subject=DEFAULT_SUBJECT, body=DEFAULT_BODY, domain="domain"):
+        self.sender = sender
+        self.subject = subject
+        self.body = Template(body)
+        self.domain = domain
+
+    # Method to get the address of a student
+    def recipient(self, student):
+        return f"{student.name}@{self.domain}"
+
+    # Method to build the message for a student
+    def render(self, student):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = self.recipient(student)
+        msg['Subject'] = self.subject
+        body = self.body.substitute(name=student.name, student_id=student.student_id,
+                                    overall=f"{student.overall:.2f}", category=student.category)
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
+
+# Rate limiter class - caps throughput at a number of messages per second across all threads
+class RateLimiter:
+
+    # Initializing the limiter - None means no cap
+    def __init__(self, per_second=None):
+        self.interval = 1 / per_second if per_second else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Method to wait for the next free slot
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Connection pool class - at most size SMTP connections, opened on demand and reused
+class SMTPConnectionPool:
+
+    # Initializing the pool settings
+    def __init__(self, host, port, sender=None, password=None, use_tls=True, size=4, timeout=30, smtp_class=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.smtp_class = smtp_class
+        self.idle = Queue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    # Method to open and log in a new connection
+    def connect(self):
+        server = self.smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.password:
+            server.login(self.sender, self.password)
+        return server
+
+    # Method to borrow a connection - blocks while every connection is in use
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        try:
+            return self.connect()
+        except Exception:
+            self.slots.release()
+            raise
+
+    # Method to return a connection - broken connections are closed instead of reused
+    def release(self, server, broken=False):
+        if broken:
+            self.discard(server)
+        else:
+            self.idle.put(server)
+        self.slots.release()
+
+    # Method to close a connection, ignoring errors
+    def discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    # Method to close every idle connection
+    def close(self):
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except Empty:
+                return
+
+
+# Notification dispatcher class - sends messages concurrently with per-message retry and backoff
+class NotificationDispatcher:
+
+    # Initializing the dispatcher
+    def __init__(self, pool, template, workers=4, max_attempts=3, backoff=0.5, rate_limit=None):
+        if max_attempts <= 0:
+            raise ValueError("Number of attempts must be a positive integer.")
+        self.pool = pool
+        self.template = template
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate_limit)
+
+    # Method to send one message, retrying transient failures with exponential backoff
+    def deliver(self, student):
+        recipient = self.template.recipient(student)
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            server = None
+            try:
+                msg = self.template.render(student)
+                self.limiter.wait()
+                server = self.pool.acquire()
+                server.send_message(msg)
+                self.pool.release(server)
+                logging.info(f"Notification sent to {recipient}")
+                return DeliveryResult(student.student_id, recipient, True, attempt, None)
+            except PERMANENT_ERRORS as e:
+                if server is not None:
+                    self.pool.release(server) # The connection itself is still fine
+                error = e
+                break
+            except Exception as e:
+                if server is not None:
+                    self.pool.release(server, broken=True)
+                error = e
+                logging.warning(f"Attempt {attempt} to notify {recipient} failed - {e}")
+                if attempt < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        logging.error(f"Could not notify {recipient} - {error}")
+        return DeliveryResult(student.student_id, recipient, False, attempt, str(error))
+
+    # Method to send to every student - returns one DeliveryResult per student, in input order
+    def send_all(self, students):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(self.deliver, students))
+        finally:
+            self.pool.close()
@@ -3,177 +3,171 @@ Categorical Marking System (Better)
 Tejas Parmar - A00026547
 Last Modified: 24 Jan 2025
 """
-# Necessary Impports
+# Necessary Impports - tabulate, notifications (smtplib, email), exporters, the SQLite repository and worker
+# processes are imported where they are first used, so importing this module stays cheap
+import glob
 import logging
 import threading
-import csv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import locale
+import os
+import shutil
+import hashlib
 from datetime import datetime
-from tabulate import tabulate
-from statistics import mean, median
-
-# Configuring the logging module - TIME, DATE - LEVEL - MESSAGE
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='cms.log',
-    filemode='a'
-)
-
-# Lists for possible marks
-category_marks_lists = (0, 5, 15, 25, 32, 35, 38,
-                        42, 45, 48, 52, 55, 58,
-                        62, 65, 68, 72, 75, 78,
-                        82, 85, 92, 100)
-
-# Categories dictionary to determine category
-categories = {
-    "Aurum Standard": [100],
-    "Upper First": [82, 85, 92],
-    "First": [72, 75, 78],
-    "2:1": [62, 65, 68],
-    "2:2": [52, 55, 58],
-    "Third": [42, 45, 48],
-    "Condonable Fail": [32, 35, 38],
-    "Fail": [25, 15, 5],
-    "Defecit Opus": [0]
-}
-
-# Student class
-class Student:
-    
-    # Initializing necessary attributes
-    def __init__(self, student_id, name, dob, scores):
-        self.student_id = student_id
-        self.name = name
-        self.dob = dob
-        self.scores = scores
-        self.age = 0
-        self.overall = 0
-        self.rounded = 0
-        self.category = ""
-
-    # Method to calculate age
-    def calculate_age(self):
-        birth_date = datetime.strptime(self.dob, "%Y-%m-%d")
-        today = datetime.now()
-        self.age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-
-    # Method to calculate overall score
-    def calculate_overall_score(self, weights):
-        if len(self.scores) != len(weights): # Return an error if there if number of scores provided are not equals to number of weights
-            raise ValueError("The number of scores and weights must match.")
-        self.overall = sum(s * w for s, w in zip(self.scores, weights))
-
-    # Method to round the score to category
-    def round_to_category(self):
-        closest_boundary = min(category_marks_lists, key=lambda x: abs(x - self.overall))
-        self.rounded = closest_boundary
-        self.category = self.determine_category(closest_boundary)
-
-    # Method to determine category
-    def determine_category(self, boundary):
-        if boundary < 0 or boundary > 100:
-            return 'Ungraded' # Return ungraded if out of bound
-        for category, values in categories.items(): # Search for boundary in categories dictionary
-            if boundary in values:
-                return category # Return the category name
-        return 'Ungraded' # Redundant - self check - does not make any difference
-
-# Module Configuration Class
-class ModuleConfig:
-    
-    # Initialize configuration list
-    def __init__(self):
-        self.module_configuration = {}  # e.g. {"Coursework1": 0.2, "Coursework2": 0.3, ...}
+from time import perf_counter, sleep
+from itertools import compress
+import numpy as np
+# The grading core, also re-exported from here so existing `from program import Student` code keeps working
+from core import (category_marks_lists, categories, GradingTable, grading_table, IdFormat, Student, ModuleConfig,
+                  validate_name, validate_dob, validate_score)
+from cohort import CohortGrader, CohortStore, LRUCache, DEFAULT_WHAT_IF_MEMORY
+from snapshot import save_snapshot, load_snapshot, source_signature
+from ingestion import (FileTail, PrefetchReader, expand_inputs, is_compressed, open_input, iter_lines, iter_line_blocks,
+                       iter_batches, line_aligned_ranges, DEFAULT_BLOCK_SIZE,
+                       DEFAULT_BATCH_SIZE, DEFAULT_CHECKPOINT_LINES)
+from metrics import IngestionMetrics, ProgressReporter
+from logs import (RejectionLog, configure_logging, start_queue_logging, direct_logging_in_worker, log_settings,
+                  DEFAULT_SUMMARY_INTERVAL, DEFAULT_SAMPLES)
 
-    # Middleware method to ask for custom module setup
-    def setup_module(self):
-        if not self.ask_for_custom_configuration(): # Ask for confirmation
-            return # Return to main if no
+# Rows per page of the console summary table
+DEFAULT_PAGE_SIZE = 1000
+PROGRESS_EVERY = 1000 # Lines a thread processes between progress updates
 
-        module_name = input("Enter module name: ")  # Redundant
-        self.configure_module() # Call method to configure module
+# Method to tag a validation error with the reason it is counted under in the metrics
+def rejected(error, reason):
+    error.reason = reason
+    return error
 
-    # Method to ask for custom module config
-    def ask_for_custom_configuration(self):
-        while True:
-            choice = input("Would you like to setup custom module configuration? (y/n): ").lower()
-            if choice in ["n", "no"]:
-                print("\n")
-                return False
-            elif choice in ["y", "yes"]:
-                return True
-            print("Invalid choice. Please enter 'y' or 'n'.")
-
-    # Method to configure module
-    def configure_module(self):
-        while True:
+# Record parser class - validates and converts a file line in one pass, with dates of birth memoised
+class RecordParser:
+
+    # Initializing the parser for one run - today is taken once so every age uses the same reference date
+    def __init__(self, expected_scores=4, today=None, metrics=None, rejection_log=None, id_format=None, echo=True):
+        self.expected_scores = expected_scores
+        self.echo = echo # Print skipped lines of thread 1 to the console - off in worker processes, whose stdout is not ours
+        self.id_format = id_format or IdFormat()
+        self.expected_parts = 3 + expected_scores  # id, name, dob + scores
+        self.today = today or datetime.now()
+        self.metrics = metrics # Rejections are counted here when set
+        self.rejection_log = rejection_log # Rejections are summarised here instead of logged one by one when set
+        self.dates = {} # Valid date of birth -> date
+        self.ages = {} # Valid date of birth -> age on self.today
+        self.timings = {} # Thread id -> [parse seconds, validate seconds], one entry per thread so no locking is needed
+
+    # Method to check a date of birth - same result and errors as datetime.strptime, but each distinct date is parsed once
+    def parse_dob(self, dob):
+        date = self.dates.get(dob)
+        if date is None:
+            date = datetime.strptime(dob, '%Y-%m-%d') # Raises ValueError for invalid dates
+            self.dates[dob] = date
+        return date
+
+    # Method to get the age for a date of birth - same rule as Student.calculate_age
+    def age(self, dob):
+        age = self.ages.get(dob)
+        if age is None:
+            birth_date = self.parse_dob(dob)
+            today = self.today
+            age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+            self.ages[dob] = age
+        return age
+
+    # Method to validate the fields of a record - returns the canonical ID, raises ValueError with the same messages
+    # as the validate_* methods
+    def validate(self, student_id, name, dob, scores):
+        if student_id.lower() != 'end':
             try:
-                num_components = self.get_number_of_components() # get the number of component
-                self.module_configuration.clear() # Clear any previous module config to avoid issues
-                total_weight = self.get_component_weights(num_components) # Get component weights based on the number of components
+                student_id = self.id_format.canonical(student_id)
+            except ValueError as e: # Includes digits int() does not accept, e.g. superscripts
+                raise rejected(e, 'id')
+        if not name.isalpha() and not all(c.isalpha() or c.isspace() for c in name):
+            raise rejected(ValueError("Name should contain only letters and spaces."), 'name')
+        try:
+            self.parse_dob(dob)
+        except ValueError as e:
+            raise rejected(e, 'dob')
+        for score in scores:
+            if not 0 <= score <= 100:
+                raise rejected(ValueError("Score must be between 0 and 100"), 'score')
+        return student_id
 
-                if abs(total_weight - 100) > 0.01: # Check if the weights add up to 100%
-                    print("Weights must sum to 100%. Please try again.")
-                    continue
-                
-                print("Module configuration complete.")
-                return
-            except ValueError:
-                logging.error("Entered an invalid integer.")
-                print("Please enter a valid integer for the number of components.")
+    # Method to count and log a rejected line
+    def reject(self, thread_id, reason, message, line, level=logging.WARNING):
+        if self.metrics is not None:
+            self.metrics.reject(reason)
+        if self.rejection_log is not None:
+            self.rejection_log.record(reason, message, line)
+        else:
+            logging.log(level, f"Thread {thread_id}: {message}")
+
+    # Method to parse a line - returns (id, name, dob, scores) or None, logging rejections exactly like before
+    def parse(self, line, thread_id, seen):
+        timing = self.timings.get(thread_id)
+        if timing is None:
+            timing = self.timings[thread_id] = [0.0, 0.0]
+        start = perf_counter()
+        reason = 'error'
+        try: # Strip each part of line by commas
+            parts = line.strip().split(',')
+            if len(parts) != self.expected_parts:
+                self.reject(thread_id, 'parts', f"Invalid number of parts. Expected {self.expected_parts}, got {len(parts)}", line)
+                if self.echo and thread_id == 1:
+                    print(f"Skipping invalid data: File contains {len(parts)-3} scores but module requires {self.expected_scores}")
+                return None
+
+            student_id, name, dob = parts[:3]
+            reason = 'score' # A score that is not a number fails the conversion below
+            scores = [float(score) for score in parts[3:]]
+            reason = 'error'
+            parsed = perf_counter()
+            timing[0] += parsed - start
 
-    # Method to get the number of components
-    def get_number_of_components(self):
-        while True:
             try:
-                num_components = int(input("How many assessment components does this module have? "))
-                if num_components <= 0:
-                    print("Number of components must be a positive integer.")
-                    continue
-                return num_components
-            except ValueError:
-                logging.error("Invalid number of components.")
-                print("Invalid input. Please enter a valid integer.")
+                student_id = self.validate(student_id, name, dob, scores)
+            except ValueError as e:
+                self.reject(thread_id, getattr(e, 'reason', 'error'), f"Validation error - {e}", line)
+                if self.echo and thread_id == 1:
+                    print(f"Skipping invalid data: {e}")
+                return None
+            finally:
+                timing[1] += perf_counter() - parsed
 
-    # Method to get component weights
-    def get_component_weights(self, num_components):
-        total_weight = 0
-        for i in range(num_components):
-            while True:
-                try:
-                    comp_name = input(f"Component {i+1} name: ").strip()
-                    if not comp_name:
-                        print("Component name cannot be empty.")
-                        continue
-                    weight = float(input(f"Enter {i+1} weight (%): "))
-                    if weight <= 0 or weight > 100:
-                        print("Weight must be between 0 and 100.")
-                        continue
-                    self.module_configuration[comp_name] = weight / 100
-                    total_weight += weight
-                    break
-                except ValueError:
-                    logging.error("Invalid number of weights.")
-                    print("Invalid input. Please try again.")
-        return total_weight
+            if student_id in seen:
+                self.reject(thread_id, 'duplicate', f"Duplicate ID {student_id}", line)
+                if self.echo and thread_id == 1:
+                    print(f"Skipping duplicate student ID: {student_id}")
+                return None
 
-    # Return the usual four weights if no configuration is available - helper method
-    def get_weights(self):
-        if self.module_configuration:
-            return list(self.module_configuration.values())
-        return [0.1, 0.2, 0.3, 0.4]  # default
+            return student_id, name, dob, scores
+
+        except Exception as e:
+            self.reject(thread_id, reason, f"Unexpected error - {e}", line, logging.ERROR)
+            if self.echo and thread_id == 1:
+                print("Skipping invalid data.")
+            return None
+
+    # Method to get the total parse and validate time across threads
+    def stage_times(self):
+        return {'parse': sum(t[0] for t in self.timings.values()),
+                'validate': sum(t[1] for t in self.timings.values())}
 
 # CMS Class
 class CategoricalMarkingSystem:
     
     # Initializing required data
     def __init__(self):
-        self.students_data = {}
+        self.students_data = CohortStore(grading_table.category_names, Student)
         self.module_config = ModuleConfig()
+        self.grader = grading_table
+        self.cohort_grader = None # Built on first vectorized run
+        self.parser = None # Record parser for the current run
+        self.grade_cache = LRUCache(8) # (cohort version, weights) -> (overall, rounded, codes)
+        self.parsed_files = LRUCache(4) # (content hash, number of scores, ID digits) -> (parsed columns, lines, rejections)
+        self.metrics = IngestionMetrics() # Timers and counters for the last ingestion run
+        self.rejection_log = None # Set by use_aggregated_logging
+        self.id_format = IdFormat() # Two-digit IDs unless set_id_format is called
+        self.echo = True # Print skipped lines to the console
+        self.tail = None # Read position in the watched file
+        self.watch_seen = set() # IDs read from the watched file, for duplicate checks across polls
 
     # Main method of class
     def run(self):
@@ -238,7 +232,7 @@ class CategoricalMarkingSystem:
         weights = self.module_config.get_weights() # Get weights from helper function
         while True:
             try: # Enter all the student information (manual part)
-                student_id = self.validate_input('id', "\nEnter Student ID (2-digit) (or 'end' to finish): ")
+                student_id = self.validate_input('id', f"\nEnter Student ID ({self.id_format.digits}-digit) (or 'end' to finish): ")
                 if student_id.lower() == 'end':
                     break
 
@@ -253,7 +247,7 @@ class CategoricalMarkingSystem:
                 stu = Student(student_id, name, dob, scores) # Create student object based on information
                 stu.calculate_age() # calculate age
                 stu.calculate_overall_score(weights) # calculate overall scre
-                stu.round_to_category() # round to category
+                stu.round_to_category(self.grader) # round to category
 
                 self.students_data[student_id] = stu
                 logging.info(f"Collected data for student ID {student_id}")
@@ -279,46 +273,102 @@ class CategoricalMarkingSystem:
                 scores.append(score)
         return scores
 
-    # Method for advanced mode
-    def advanced(self, filename):
-        self.students_data.clear()
-        weights = self.module_config.get_weights()
+    # Method for advanced mode - with a snapshot path, an unchanged file graded with the same weights is
+    # reloaded from the snapshot instead of being parsed again, and a fresh snapshot is saved otherwise.
+    # filename may also be a list of files, globs or directories, graded together as one cohort.
+    def advanced(self, filename, vectorized=False, streaming=False, batch_size=DEFAULT_BATCH_SIZE, workers=0, snapshot=None,
+                 executor=None, checkpoint=None, checkpoint_every=DEFAULT_CHECKPOINT_LINES):
+        single = isinstance(filename, (str, os.PathLike)) and os.path.isfile(filename) # Snapshots cover one file
+        if snapshot and single:
+            self.metrics.reset() # Figures describe this run, even when it is only a snapshot load
+            with self.metrics.timer('read'):
+                loaded = self.load_snapshot(snapshot, filename)
+            if loaded:
+                self.metrics.finish(accepted=len(self.students_data))
+                print(f"Loaded {len(self.students_data)} graded students from {snapshot}")
+                return
+        self.ingest_file(filename, vectorized, streaming, batch_size, workers, executor, checkpoint, checkpoint_every)
+        if snapshot and single:
+            self.save_snapshot(snapshot, filename)
 
-        try: # Open given file name
-            with open(filename, 'r') as f:
-                lines = f.readlines()
+    # Method to read and grade a file - vectorized grades the whole file with array operations instead of threads,
+    # streaming reads and grades the file batch by batch in bounded memory, workers grades it in worker processes,
+    # checkpoint grades it block by block and saves progress so an interrupted run can resume. Several files, or a
+    # compressed one, are graded with read_files.
+    def ingest_file(self, filename, vectorized=False, streaming=False, batch_size=DEFAULT_BATCH_SIZE, workers=0, executor=None,
+                    checkpoint=None, checkpoint_every=DEFAULT_CHECKPOINT_LINES):
+        self.students_data.clear()
+        self.parser = None # New run, new reference date for ages
+        self.tail = None # A later refresh starts from the beginning of its file
+        self.metrics.reset()
+        try:
+            if checkpoint:
+                if self.multiple_inputs(filename):
+                    raise ValueError("Checkpoints need a single uncompressed file.")
+                self.ingest_resumable(filename, checkpoint, checkpoint_every)
+            else:
+                self.read_students(filename, vectorized, streaming, batch_size, workers, executor)
         except FileNotFoundError:
             logging.error("File not found error occurred.")
             print(f"File {filename} not found")
+        finally:
+            self.finish_run()
+
+    # Method to fill the store from a file in the chosen mode
+    def read_students(self, filename, vectorized, streaming, batch_size, workers, executor):
+        weights = self.module_config.get_weights()
+
+        if self.multiple_inputs(filename):
+            self.read_files(filename, workers, executor)
             return
-        
+
+        if workers:
+            self.advanced_parallel(filename, workers, executor)
+            return
+
+        if streaming:
+            for batch in self.stream_students(filename, batch_size):
+                with self.metrics.timer('merge'):
+                    for stu in batch:
+                        self.students_data[stu.student_id] = stu
+            return
+
+        if vectorized: # Parse every line first (or reuse an earlier parse of the same content), then grade in one go
+            self.grade_columns(*self.parse_file(filename), weights)
+            return
+
+        with self.metrics.timer('read'), open(filename, 'r') as f: # Open given file name
+            lines = f.readlines()
+        self.metrics.merge(lines=len(lines))
+
+        parser = self.record_parser()
+        progress = ProgressReporter(total=len(lines)) # Shared by both threads, prints at most twice a second
+        buffers = {1: [], 2: []} # Each thread fills its own list, so no lock is taken per student
+
         # Sub-function to process a chuck of the data
         def process_chunk(chunk, thread_id):
-            total = len(chunk)
+            buffer = buffers[thread_id]
+            seen = set() # Duplicates inside this chunk - duplicates across chunks are found at the merge
+            grade_seconds = 0.0
             for i, line in enumerate(chunk, 1): # for line in each chunk
-                stu = self.process_each_line(line, thread_id) # proess each line
+                stu = self.process_each_line(line, thread_id, seen) # proess each line
                 if stu:
-                    stu.calculate_age()
+                    seen.add(stu.student_id)
+                    start = perf_counter()
+                    stu.age = parser.age(stu.dob) # Memoised per date of birth
                     stu.calculate_overall_score(weights)
-                    stu.round_to_category()
-
-                    # Combine both threats
-                    lock.acquire()
-                    try: # Check for duplicates
-                        if stu.student_id not in self.students_data:
-                            self.students_data[stu.student_id] = stu
-                    finally: # Release threads
-                        lock.release()
-                if thread_id == 1:  # Only show progress from one thread
-                    print(f"\rProgress: {i}/{total} records processed", end="")
+                    stu.round_to_category(self.grader)
+                    grade_seconds += perf_counter() - start
+                    buffer.append(stu)
+                if i % PROGRESS_EVERY == 0:
+                    progress.update(PROGRESS_EVERY)
+            progress.update(len(chunk) % PROGRESS_EVERY)
+            self.metrics.add_time('grade', grade_seconds)
                         
         # Calculate midpoint of the number of lines
         mid_point = len(lines) // 2
         chunk1 = lines[:mid_point] # Distribute between chunk 1 & 2
         chunk2 = lines[mid_point:]
-
-        # Get a lock pointer for threading
-        lock = threading.Lock()
         
         # Initialize two threads both responsible for processing each chunk
         t1 = threading.Thread(target=process_chunk, args=(chunk1, 1))
@@ -331,52 +381,453 @@ class CategoricalMarkingSystem:
         # Join threads
         t1.join()
         t2.join()
+        progress.finish()
 
-    # Method to process each line.
-    def process_each_line(self, line, thread_id):
-        try: # Strip each part of line by commas
-            parts = line.strip().split(',')
-        
-            # Get expected number of scores from module config
-            expected_scores = (len(self.module_config.module_configuration) if self.module_config.module_configuration else 4)
-        
-            # Check if total parts match expected format
-            expected_parts = 3 + expected_scores  # id, name, dob + scores
-            if len(parts) != expected_parts:
-                logging.warning(f"Thread {thread_id}: Invalid number of parts. Expected {expected_parts}, got {len(parts)}")
-                if thread_id == 1:
-                    print(f"Skipping invalid data: File contains {len(parts)-3} scores but module requires {expected_scores}")
-                return None
-            
-            student_id, name, dob = parts[:3]
-            scores = [float(score) for score in parts[3:7]]
+        # Combine both threads in file order - the first occurrence of an ID wins, whichever thread finished first
+        with self.metrics.timer('merge'):
+            for thread_id, buffer in buffers.items():
+                for stu in buffer:
+                    if stu.student_id in self.students_data:
+                        self.reject_duplicate(thread_id, stu.student_id)
+                    else:
+                        self.students_data[stu.student_id] = stu
 
-            # Validate all fields
-            try:
-                self.validate_id(student_id)
-                self.validate_name(name)
-                self.validate_dob(dob)
-                for sc in scores:
-                    self.validate_score(str(sc))
-            except ValueError as e:
-                logging.warning(f"Thread {thread_id}: Validation error - {e}")
-                if thread_id == 1:
-                    print(f"Skipping invalid data: {e}")
-                return None
+    # Method to check whether an input needs read_files - a list, a directory, a glob or a compressed file
+    def multiple_inputs(self, filename):
+        if not isinstance(filename, (str, os.PathLike)):
+            return True
+        filename = str(filename)
+        return os.path.isdir(filename) or (not os.path.exists(filename) and glob.has_magic(filename)) or is_compressed(filename)
 
-            if student_id in self.students_data:
-                logging.warning(f"Thread {thread_id}: Duplicate ID {student_id}")
-                if thread_id == 1:
-                    print(f"Skipping duplicate student ID: {student_id}")
-                return None
+    # Method to grade several files, plain or compressed, as one cohort - with workers each file is graded in its own
+    # worker process, otherwise a background thread decompresses each file while this one parses it. Either way the
+    # files are merged in the order expand_inputs gives, and the first occurrence of an ID across all of them wins.
+    def read_files(self, filenames, workers=0, executor=None):
+        files = expand_inputs(filenames)
+        found = [filename for filename in files if os.path.isfile(filename)]
+        for filename in files:
+            if filename not in found:
+                logging.error(f"File {filename} not found.")
+                print(f"File {filename} not found")
+        if workers:
+            self.read_files_parallel(found, workers, executor)
+            return
 
-            return Student(student_id, name, dob, scores)
-        
-        except Exception as e:
-            logging.error(f"Thread {thread_id}: Unexpected error - {e}")
-            if thread_id == 1:
-                print("Skipping invalid data.")
+        weights = self.module_config.get_weights()
+        seen = set(self.students_data) # Shared by every file, so a repeat in a later file is a duplicate
+        for file_id, filename in enumerate(found, 1):
+            records = []
+            lines = 0
+            with open_input(filename) as f:
+                batches = iter_batches(iter_lines(PrefetchReader(f)), DEFAULT_BATCH_SIZE)
+                while True:
+                    with self.metrics.timer('read'):
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    records.extend(self.parse_records(batch, file_id, seen))
+                    lines += len(batch)
+            self.metrics.merge(lines=lines)
+            if records:
+                self.grade_cohort(records, weights)
+        logging.info(f"Graded {len(self.students_data)} students from {len(found)} files")
+
+    # Method for parallel multi-file mode - one worker process per file, merged in file order
+    def read_files_parallel(self, files, workers, executor=None):
+        config, today, rejections, digits, log = self.worker_settings()
+        args = [(filename, config, file_id, today, rejections, digits, log) for file_id, filename in enumerate(files, 1)]
+        self.merge_worker_results(run_workers(grade_input_file, args, workers, executor))
+        logging.info(f"Graded {len(self.students_data)} students from {len(files)} files in worker processes")
+
+    # Method to close a run - parse and validate time comes from the run's parser, pending rejections are summarised
+    def finish_run(self):
+        if self.parser is not None:
+            self.metrics.merge(timers=self.parser.stage_times())
+        self.metrics.finish(accepted=len(self.students_data))
+        if self.rejection_log is not None:
+            self.rejection_log.flush()
+
+    # Method to switch to queue-based logging, with rejected lines summarised every interval seconds instead of
+    # logged one by one - each summary keeps a few example lines per reason
+    def use_aggregated_logging(self, interval=DEFAULT_SUMMARY_INTERVAL, samples=DEFAULT_SAMPLES):
+        start_queue_logging()
+        self.rejection_log = RejectionLog(interval, samples)
+        self.parser = None # Rebuilt with the rejection log
+
+    # Method to accept student IDs of up to `digits` digits - empties the cohort, as stored IDs are formatted differently
+    def set_id_format(self, digits):
+        self.id_format = IdFormat(digits)
+        self.students_data.id_format = self.id_format.template
+        self.students_data.clear()
+        self.parser = None # Rebuilt with the new format
+
+    # Method to count and log a duplicate found when per-thread or per-worker results are merged
+    def reject_duplicate(self, thread_id, student_id):
+        self.metrics.reject('duplicate')
+        if self.rejection_log is not None:
+            self.rejection_log.record('duplicate', f"Duplicate ID {student_id}")
+        else:
+            logging.warning(f"Thread {thread_id}: Duplicate ID {student_id}")
+
+    # Method to get the timers and counters of the last ingestion run as a dict
+    def ingestion_metrics(self):
+        return self.metrics.as_dict()
+
+    # Method for checkpointed mode - grades the file block by block and appends a segment to the checkpoint directory
+    # every `every` lines, splitting a block where a checkpoint falls inside it. A segment holds only the students graded
+    # since the previous one, with the read position and counters reached. A run that finds a checkpoint for the same
+    # file and weights merges its segments and carries on, and the checkpoint is removed once the whole file is graded.
+    def ingest_resumable(self, filename, checkpoint, every=DEFAULT_CHECKPOINT_LINES, block_size=DEFAULT_BLOCK_SIZE):
+        if every <= 0:
+            raise ValueError("Lines between checkpoints must be a positive integer.")
+        encoding = locale.getpreferredencoding(False) # Same as iter_line_blocks, to measure lines in bytes
+        source = source_signature(filename)
+        weights = self.module_config.get_weights()
+        state = self.resume_checkpoint(checkpoint, source)
+        offset = segment = 0
+        if state is None: # Nothing to carry on from - stale segments must not be merged with new ones
+            self.remove_checkpoint(checkpoint)
+        else:
+            offset, segment = state['offset'], state['segment'] + 1
+            self.metrics.merge(rejected=state['rejected'], lines=state['lines'])
+            print(f"Resuming {filename} after line {state['lines']} from checkpoint {checkpoint}")
+        seen = set(self.students_data) # Every accepted ID so far - the duplicate set is the cohort itself
+        since_checkpoint, start = 0, len(self.students_data)
+
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            blocks = iter_line_blocks(f, block_size, encoding)
+            while True:
+                with self.metrics.timer('read'):
+                    block = next(blocks, None)
+                if block is None:
+                    break
+                lines, end = block
+                while lines: # Up to the next checkpoint at a time
+                    part, lines = lines[:every - since_checkpoint], lines[every - since_checkpoint:]
+                    records = self.parse_records(part, 1, seen)
+                    if records:
+                        self.grade_cohort(records, weights)
+                    self.metrics.merge(lines=len(part))
+                    since_checkpoint += len(part)
+                    if since_checkpoint >= every: # Carry on after this part - the block end less the lines still left
+                        offset = end - sum(len(line.encode(encoding)) + 1 for line in lines)
+                        self.write_checkpoint(checkpoint, source, offset, segment, start)
+                        since_checkpoint, start, segment = 0, len(self.students_data), segment + 1
+
+        self.remove_checkpoint(checkpoint) # Finished - nothing left to resume
+
+    # Method to append a checkpoint segment - the students from row `start` on, with the position to carry on from
+    def write_checkpoint(self, checkpoint, source, offset, segment, start):
+        state = {'offset': offset, 'lines': self.metrics.lines, 'rejected': dict(self.metrics.rejected), 'segment': segment}
+        filename = os.path.join(checkpoint, f"{segment:06d}.seg")
+        with self.metrics.timer('export'):
+            os.makedirs(checkpoint, exist_ok=True)
+            save_snapshot(self.students_data, filename, self.module_config.get_weights(), self.grader, source, state, start)
+        logging.info(f"Checkpoint after line {state['lines']} saved to {filename}")
+
+    # Method to merge the segments of a checkpoint into the store - returns the state of the last one, or None if there is
+    # no usable checkpoint. One bad or missing segment makes the whole checkpoint unusable.
+    def resume_checkpoint(self, checkpoint, source):
+        try:
+            segments = sorted(name for name in os.listdir(checkpoint) if name.endswith('.seg'))
+        except (FileNotFoundError, NotADirectoryError):
             return None
+        store, state = self.students_data, None
+        part = CohortStore(store.category_names, store.student_factory, store.id_format)
+        try:
+            for segment, name in enumerate(segments):
+                if name != f"{segment:06d}.seg":
+                    raise ValueError(f"segment {segment} is missing")
+                metadata = load_snapshot(part, os.path.join(checkpoint, name), self.module_config.get_weights(), self.grader, source)
+                if metadata['extra'] is None: # A plain snapshot, not a checkpoint segment
+                    raise ValueError(f"{name} has no read position")
+                rows = range(part.size)
+                codes = np.array([store.category_code(category) for category in part.category_names], dtype=np.int8)
+                store.extend([part.student_id(row) for row in rows], [part.name(row) for row in rows],
+                             [part.dob(row) for row in rows], part.scores, part.overall, part.rounded,
+                             codes[part.codes], part.ages)
+                state = metadata['extra']
+        except ValueError as e:
+            logging.warning(f"Checkpoint {checkpoint} not used - {e}")
+            store.clear()
+            return None
+        return state
+
+    # Method to delete a checkpoint and all of its segments
+    def remove_checkpoint(self, checkpoint):
+        if os.path.isdir(checkpoint):
+            shutil.rmtree(checkpoint)
+        elif os.path.exists(checkpoint): # A single-file checkpoint from an older version
+            os.remove(checkpoint)
+
+    # Method to bring the cohort up to date with a growing file - only lines appended since the last call are parsed and
+    # graded, and the whole file is read again if it was replaced or truncated. A missing file counts as no new lines.
+    # Returns the number of students added.
+    def refresh(self, filename):
+        if self.tail is None or self.tail.filename != filename:
+            self.tail = FileTail(filename)
+        self.metrics.reset() # Metrics describe this poll only
+        try:
+            with self.metrics.timer('read'):
+                reset, lines = self.tail.read_new_lines()
+        except FileNotFoundError: # Not created yet, or between the move and create of a rotation - the tail keeps the
+            # old identity, so the file that appears later is read from the start
+            logging.info(f"{filename} not found, waiting for it")
+            self.finish_run()
+            return 0
+        if reset: # First call, or the file was rotated or rewritten - start the cohort again
+            logging.info(f"Reading {filename} from the start")
+            self.students_data.clear()
+            self.parser = None
+            self.watch_seen = set()
+        elif self.parser is not None: # Keep the memoised dates, but time only this poll's parsing
+            self.parser.timings = {}
+        self.metrics.merge(lines=len(lines))
+
+        records = self.parse_records(lines, 1, self.watch_seen)
+        if records:
+            self.grade_cohort(records) # Appends to the store - analytics and indexes are updated, not rebuilt
+        self.finish_run()
+        logging.info(f"Added {len(records)} students from {len(lines)} new lines of {filename}")
+        return len(records)
+
+    # Method for watch mode - refreshes from the file every interval seconds until interrupted (or for polls polls)
+    def watch(self, filename, interval=1.0, polls=None):
+        done = 0
+        try:
+            while polls is None or done < polls:
+                added = self.refresh(filename)
+                if added:
+                    print(f"{added} new students, {len(self.students_data)} in total")
+                done += 1
+                if polls is None or done < polls:
+                    sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+
+    # Method for parallel mode - each worker process parses and grades one line-aligned byte range of the file
+    def advanced_parallel(self, filename, workers, executor=None):
+        ranges = line_aligned_ranges(filename, workers)
+        config, today, rejections, digits, log = self.worker_settings()
+        args = [(filename, start, end, config, chunk_id, today, rejections, digits, log)
+                for chunk_id, (start, end) in enumerate(ranges, 1)]
+        self.merge_worker_results(run_workers(grade_file_chunk, args, workers, executor))
+        logging.info(f"Graded {len(self.students_data)} students with {len(ranges)} worker chunks")
+
+    # Method to get what every worker process needs to grade like this one - (module configuration, reference date,
+    # rejection log settings, ID digits, log settings)
+    def worker_settings(self):
+        rejections = (self.rejection_log.interval, self.rejection_log.samples) if self.rejection_log else None
+        today = datetime.now() # One reference date for every worker
+        return dict(self.module_config.module_configuration), today, rejections, self.id_format.digits, log_settings()
+
+    # Method to add worker results to the store - results are combined in the order given (chunks in file order, or
+    # files in input order) and the first occurrence of an ID wins, so the outcome never depends on which worker
+    # finished first
+    def merge_worker_results(self, results):
+        for result in results: # Worker timers add up across processes, like thread time
+            self.metrics.merge(**result[8])
+
+        with self.metrics.timer('merge'):
+            seen = set(self.students_data)
+            columns = [[] for _ in range(8)]
+            for chunk_id, result in enumerate(results, 1):
+                keep = []
+                for sid in result[0]:
+                    if sid in seen:
+                        self.reject_duplicate(chunk_id, sid)
+                        keep.append(False)
+                    else:
+                        seen.add(sid)
+                        keep.append(True)
+                for column, values in zip(columns[:3], result[:3]):
+                    column.extend(compress(values, keep))
+                for column, values in zip(columns[3:], result[3:8]):
+                    column.append(values[np.asarray(keep, dtype=bool)])
+
+            student_ids, names, dobs = columns[:3]
+            scores, overall, rounded, codes, ages = (np.concatenate(c) if c else np.empty(0) for c in columns[3:])
+            scores = scores.reshape(len(student_ids), len(self.module_config.get_weights()))
+            self.students_data.extend(student_ids, names, dobs, scores, overall, rounded, codes, ages)
+
+    # Generator for streaming mode - yields lists of graded students, at most batch_size each
+    def stream_students(self, filename, batch_size=DEFAULT_BATCH_SIZE, block_size=DEFAULT_BLOCK_SIZE):
+        weights = self.module_config.get_weights()
+        seen = set(self.students_data) # IDs already in the cohort count as duplicates
+        self.parser = None # New run, new reference date for ages
+        parser = self.record_parser()
+        progress = ProgressReporter()
+
+        with open(filename, 'r') as f:
+            batches = iter_batches(iter_lines(f, block_size), batch_size)
+            while True:
+                with self.metrics.timer('read'):
+                    lines = next(batches, None)
+                if lines is None:
+                    break
+                records = self.parse_records(lines, 1, seen)
+                with self.metrics.timer('grade'):
+                    batch = []
+                    for record in records:
+                        stu = Student(*record)
+                        stu.age = parser.age(stu.dob) # Memoised per date of birth
+                        stu.calculate_overall_score(weights)
+                        stu.round_to_category(self.grader)
+                        batch.append(stu)
+                self.metrics.merge(lines=len(lines))
+                progress.update(len(lines))
+                yield batch
+        progress.finish()
+
+    # Method to parse and validate a whole file - cached by content hash, so an unchanged file is only parsed once
+    def parse_file(self, filename):
+        with self.metrics.timer('read'):
+            with open(filename, 'rb') as f:
+                data = f.read()
+            num_scores = len(self.module_config.get_weights())
+            key = (hashlib.sha256(data).hexdigest(), num_scores, self.id_format.digits)
+        parsed = self.parsed_files.get(key)
+        if parsed is not None:
+            logging.info(f"Reusing parsed contents of {filename}")
+            columns, lines, rejected = parsed
+            self.metrics.merge(rejected=rejected, lines=lines) # Same file, same rejections
+            return columns
+
+        rejected_before = dict(self.metrics.rejected)
+        with self.metrics.timer('read'):
+            lines = data.decode(locale.getpreferredencoding(False)).split('\n')
+            if not lines[-1]:
+                lines.pop()
+        records = self.parse_records(lines, 1, set())
+        columns = ([r[0] for r in records], [r[1] for r in records], [r[2] for r in records],
+                   np.asarray([r[3] for r in records], dtype=np.float64).reshape(len(records), num_scores))
+        rejected = {reason: count - rejected_before.get(reason, 0) for reason, count in self.metrics.rejected.items()}
+        self.metrics.merge(lines=len(lines))
+        self.parsed_files.put(key, (columns, len(lines), rejected))
+        return columns
+
+    # Method to grade parsed records as one cohort and add them to the store - Student objects are only built when asked for
+    def grade_cohort(self, records, weights=None):
+        weights = weights or self.module_config.get_weights()
+        scores = np.asarray([r[3] for r in records], dtype=np.float64).reshape(len(records), len(weights))
+        self.grade_columns([r[0] for r in records], [r[1] for r in records], [r[2] for r in records], scores, weights)
+
+    # Method to grade parsed columns and add them to the store
+    def grade_columns(self, student_ids, names, dobs, scores, weights=None):
+        weights = weights or self.module_config.get_weights()
+        if self.cohort_grader is None:
+            self.cohort_grader = CohortGrader(self.grader)
+        with self.metrics.timer('grade'):
+            overall, rounded, codes, ages = self.cohort_grader.grade(scores, weights, dobs)
+        with self.metrics.timer('merge'):
+            self.students_data.extend(student_ids, names, dobs, scores, overall, rounded, codes, ages)
+        logging.info(f"Graded cohort of {len(student_ids)} students")
+
+    # Method to re-grade the cohort for new weights - the stored raw scores are reused, nothing is parsed again. Explicit
+    # weights become the module's weights, so snapshots, checkpoints and the repository record what the cohort was
+    # graded with.
+    def regrade(self, weights=None):
+        weights = tuple(weights or self.module_config.get_weights())
+        store = self.students_data
+        if store.width is not None and len(weights) != store.width:
+            raise ValueError("The number of scores and weights must match.")
+        if self.cohort_grader is None:
+            self.cohort_grader = CohortGrader(self.grader)
+
+        key = (store.version, weights) # Results for a weight vector are reused until the cohort changes
+        graded = self.grade_cache.get(key)
+        if graded is None:
+            overall = self.cohort_grader.overall_scores(store.scores, weights)
+            graded = (overall,) + self.cohort_grader.round_scores(overall)
+            self.grade_cache.put(key, graded)
+        store.set_grades(*graded)
+        if list(weights) != self.module_config.get_weights():
+            self.module_config.replace_weights(weights)
+        logging.info(f"Re-graded {len(store)} students with weights {list(weights)}")
+
+    # Method to see how the cohort would be graded under many candidate weightings without changing it - weight_matrix
+    # has one row of weights (fractions, like get_weights) per candidate. Returns one dict per candidate with the
+    # category histogram, mean, median and number of failing students (Fail and Defecit Opus).
+    def what_if(self, weight_matrix, memory=DEFAULT_WHAT_IF_MEMORY):
+        store = self.students_data
+        if self.cohort_grader is None:
+            self.cohort_grader = CohortGrader(self.grader)
+        counts, means, medians = self.cohort_grader.evaluate(store.scores, weight_matrix, memory)
+        names = self.cohort_grader.category_names
+        failing = [names.index(c) for c in ("Fail", "Defecit Opus") if c in names]
+        results = []
+        for weights, histogram, mean, median in zip(np.atleast_2d(weight_matrix), counts.tolist(), means, medians):
+            results.append({
+                'weights': [float(w) for w in weights],
+                'categories': {name: count for name, count in zip(names, histogram) if count},
+                'mean': float(mean),
+                'median': float(median),
+                'fail': sum(histogram[code] for code in failing),
+            })
+        logging.info(f"Evaluated {len(results)} candidate weightings against {len(store)} students")
+        return results
+
+    # Method to change the module weights after grading and re-grade the stored cohort
+    def reconfigure_module(self):
+        self.module_config.configure_module()
+        try:
+            self.regrade()
+        except ValueError as e:
+            logging.error(f"Re-grade failed - {e}")
+            print("The number of components changed. Please read the file again.")
+
+    # Method to save the graded cohort to a binary snapshot, optionally tied to the input file it came from
+    def save_snapshot(self, filename, source_file=None):
+        source = source_signature(source_file) if source_file else None
+        save_snapshot(self.students_data, filename, self.module_config.get_weights(), self.grader, source)
+        logging.info(f"Saved snapshot of {len(self.students_data)} students to {filename}")
+
+    # Method to reload a snapshot - returns False if it is missing, stale or does not match the input file
+    def load_snapshot(self, filename, source_file=None):
+        source = source_signature(source_file) if source_file else None
+        try:
+            load_snapshot(self.students_data, filename, self.module_config.get_weights(), self.grader, source)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            logging.warning(f"Snapshot {filename} not used - {e}")
+            return False
+        logging.info(f"Loaded snapshot of {len(self.students_data)} students from {filename}")
+        return True
+
+    # Method to process each line.
+    def process_each_line(self, line, thread_id, seen=None):
+        record = self.parse_record(line, thread_id, seen)
+        if record:
+            return Student(*record)
+        return None
+
+    # Method to parse and validate each line - returns (id, name, dob, scores) or None
+    def parse_record(self, line, thread_id, seen=None):
+        if seen is None:
+            seen = self.students_data
+        return self.record_parser().parse(line, thread_id, seen)
+
+    # Method to parse and validate lines - returns the accepted records and adds their IDs to seen, so a later repeat
+    # is a duplicate
+    def parse_records(self, lines, thread_id, seen):
+        parser = self.record_parser()
+        records = []
+        for line in lines:
+            record = parser.parse(line, thread_id, seen)
+            if record:
+                seen.add(record[0])
+                records.append(record)
+        return records
+
+    # Method to get the parser for the current run - rebuilt when the number of scores changes
+    def record_parser(self):
+        expected_scores = len(self.module_config.get_weights())
+        if self.parser is None or self.parser.expected_scores != expected_scores or self.parser.id_format is not self.id_format:
+            self.parser = RecordParser(expected_scores, metrics=self.metrics, rejection_log=self.rejection_log,
+                                       id_format=self.id_format, echo=self.echo)
+        return self.parser
 
     def validate_input(self, input_type, prompt):
         """Generic input validation method that handles different types of inputs."""
@@ -410,79 +861,68 @@ class CategoricalMarkingSystem:
         if user_input.lower() == 'end':
             return user_input
 
-        stripped_id = user_input.lstrip('0')
-        if not stripped_id:
-            stripped_id = '0'
-
-        if not stripped_id.isdigit() or int(stripped_id) > 99:
-            raise ValueError("ID must be a 2-digit number.")
-
-        return user_input.zfill(2)
+        return self.id_format.canonical(user_input)
 
     def validate_name(self, user_input):
-        if not all(c.isalpha() or c.isspace() for c in user_input):
-            raise ValueError("Name should contain only letters and spaces.")
-        return user_input
+        return validate_name(user_input)
 
     def validate_dob(self, user_input):
-        datetime.strptime(user_input, '%Y-%m-%d')
-        return user_input
+        return validate_dob(user_input)
 
     def validate_score(self, user_input):
-        score = float(user_input)
-        if not 0 <= score <= 100:
-            raise ValueError("Score must be between 0 and 100")
-        return score
-
-    # Function to display data
-    def display_and_save_data(self):
-        table_data = []
-        headers = ["UID", "Name", "D.o.B", "Age", "Raw Score", "Rounded Score", "Category"]
+        return validate_score(user_input)
 
-        # for each id in sorted id dict
-        for sid in sorted(self.students_data.keys()):
-            stu = self.students_data[sid]
-            table_data.append([
-                stu.student_id,
-                stu.name,
-                stu.dob,
-                stu.age,
-                f"{stu.overall:.4f}",
-                stu.rounded,
-                stu.category
-            ])
+    # Function to display data - the table is printed a page at a time, and show=False skips the console entirely
+    def display_and_save_data(self, show=True, page_size=DEFAULT_PAGE_SIZE, path='./students.csv', fmt=None, compress=None):
+        if show:
+            self.display_table(page_size)
+        self.save_to_file(path, fmt, compress)
+        logging.info("Data displayed and saved")
 
+    # Method to print the summary table in id order, one page of rows at a time
+    def display_table(self, page_size=DEFAULT_PAGE_SIZE):
+        from tabulate import tabulate
+        headers = ["UID", "Name", "D.o.B", "Age", "Raw Score", "Rounded Score", "Category"]
+        rows = self.students_data.iter_rows(self.students_data.sorted_rows()) # read straight from the columns
         print("\nStudent Summary: ")
-        print(tabulate(table_data, headers=headers))
-        # self.save_to_file(table_data, headers)
-        self.save_to_file()
-        logging.info("Data displayed and saved")
+        for page, batch in enumerate(iter_batches(rows, page_size), 1):
+            if page > 1:
+                print(f"\n(page {page})")
+            table_data = [[sid, name, dob, age, f"{overall:.4f}", rounded, category]
+                          for sid, name, dob, age, overall, rounded, category in batch]
+            print(tabulate(table_data, headers=headers))
+
+    # Function to save information to file - CSV by default, JSON Lines for .jsonl, gzip for .gz
+    def save_to_file(self, path='./students.csv', fmt=None, compress=None):
+        from exporters import export_rows
+        with self.metrics.timer('export'):
+            export_rows(self.students_data.iter_rows(), path, fmt, compress)
+        print(f"\nResults exported to {os.path.normpath(path)}\n")
+        logging.info(f"Data saved to {path}")
+
+    # Method to store the graded cohort in a SQLite repository - students already stored for the module are updated,
+    # replace=True also drops the ones no longer in the cohort
+    def save_to_repository(self, path, module=None, replace=False):
+        from repository import CohortRepository
+        module = module or self.module_config.module_name or 'default'
+        with self.metrics.timer('export'), CohortRepository(path) as repository:
+            count = repository.save_cohort(self.students_data, module, self.module_config.get_weights(), replace)
+        print(f"Saved {len(self.students_data)} students to module {module} in {path} ({count} stored)")
+        logging.info(f"Saved {len(self.students_data)} students to module {module} in {path}")
+        return count
 
-    # def save_to_file(self, table_data, headers):
-    # Function to save information to csv file
-    def save_to_file(self):
-        with open('./students.csv', 'w', newline='') as f:
-            writer = csv.writer(f) # Initialize file pointer
-            writer.writerow(['ID', 'Name', 'DOB', 'Age', 'Overall', 'Rounded', 'Category']) # Header row
-            for stu in self.students_data.values(): # Write datas
-                writer.writerow([stu.student_id, stu.name, stu.dob, stu.age,
-                               f"{stu.overall:.2f}", stu.rounded, stu.category])
-        print("\nResults exported to students.csv\n")
-        # with open('./students.txt', "w") as f:
-        #     f.write(tabulate(table_data, headers=headers))
-        # logging.info("Data saved to students.txt")
-    
     # Function to show analytics - min, max, mean, median
     def show_analytics(self):
         if not self.students_data:
             print("No student data available.")
             return
 
-        all_overalls = [stu.overall for stu in self.students_data.values()]
-        min_score = min(all_overalls)
-        max_score = max(all_overalls)
-        avg_score = mean(all_overalls)
-        med_score = median(all_overalls)
+        # Figures come from the running analytics - nothing is rescanned or sorted here
+        analytics = self.students_data.analytics
+        min_score = analytics.minimum()
+        max_score = analytics.maximum()
+        avg_score = analytics.mean()
+        med_score = analytics.median()
         
         print("\n--- Analytics Summary ---")        
         print(f"Lowest score: {min_score:.2f}")
@@ -490,10 +930,8 @@ class CategoricalMarkingSystem:
         print(f"Average score: {avg_score:.2f}")
         print(f"Median score: {med_score:.2f}")
         
-        # Calculate students in each category
-        category_count = {}
-        for stu in self.students_data.values():
-            category_count[stu.category] = category_count.get(stu.category, 0) + 1
+        # Students in each category, listed in order of first appearance
+        category_count = self.students_data.category_counts()
 
         # Show category distribution
         print("\n--- Category Distribution ---")
@@ -501,48 +939,92 @@ class CategoricalMarkingSystem:
             print(f"{cat}: {cnt} student(s)")
     
     # Function to notify failing studnets
-    def notify_failing_students(self):
+    def notify_failing_students(self, workers=4, rate_limit=None, dispatcher=None):
         
         # Initialize SMTP configuration
         smtp_server = "smtp.gmail.com"
         port = 587
-        sender_email = input("Enter your email: ")
-        password = input("Enter your email password: ")
-        
-        try: # Establish a connection with smtp server
-            server = smtplib.SMTP(smtp_server, port)
-            server.starttls()
-            server.login(sender_email, password)
-            
-            # check for students with fail and d. opus
-            for sid, student in self.students_data.items():
-                if student.category in ["Fail", "Defecit Opus"]:
-                    
-                    # Initialize message/email structure
-                    msg = MIMEMultipart()
-                    msg['From'] = sender_email
-                    msg['To'] = f"{student.name}@domain"
-                    msg['Subject'] = "Important: Course Performance Update"
-                    
-                    body = f"""Dear {student.name} - {sid},
-                    This is to inform you about your current academic standing.
-                    Your overall score is {student.overall:.2f}
-                    Category: {student.category}
-                    
-                    Please contact your module leader for support.
-                    """
-                    
-                    msg.attach(MIMEText(body, 'plain'))
-                    server.send_message(msg)
-                    print(f"Notification sent to {student.name}")
-                    logging.info("Message sent to failing and defecit opus students.")
-            server.quit()
-            print("All notifications sent successfully")
-            
-        except Exception as e:
-            print(f"Error sending notifications: {e}")
+        if dispatcher is None:
+            from notifications import MessageTemplate, NotificationDispatcher, SMTPConnectionPool
+            sender_email = input("Enter your email: ")
+            password = input("Enter your email password: ")
+            pool = SMTPConnectionPool(smtp_server, port, sender_email, password, size=workers)
+            dispatcher = NotificationDispatcher(pool, MessageTemplate(sender_email), workers=workers, rate_limit=rate_limit)
+
+        # check for students with fail and d. opus - looked up in the category index, not scanned
+        students = self.students_data.in_categories("Fail", "Defecit Opus")
+
+        report = dispatcher.send_all(students)
+        sent = sum(1 for result in report if result.sent)
+        for student, result in zip(students, report):
+            if result.sent:
+                print(f"Notification sent to {student.name}")
+            else:
+                print(f"Error sending notification to {student.name}: {result.error}")
+        logging.info(f"Sent {sent} of {len(report)} notifications to failing and defecit opus students.")
+        print(f"{sent} of {len(report)} notifications sent successfully")
+        return report
+
+# Method to set up the marking system of a worker process like the parent's
+def worker_system(module_configuration, rejections=None, id_digits=2, log=None):
+    direct_logging_in_worker(log) # log is the parent's (log file, level), for workers that did not inherit handlers
+    cms = CategoricalMarkingSystem()
+    cms.echo = False # Worker stdout is the parent's real stdout, e.g. the batch CLI's JSON summary
+    cms.set_id_format(id_digits)
+    if rejections: # (interval, samples) of the parent's rejection log
+        cms.rejection_log = RejectionLog(*rejections)
+    cms.module_config.module_configuration = module_configuration
+    return cms
+
+# Method to run a worker over argument tuples in worker processes - results come back in the order of args. A caller's
+# pool is reused, otherwise a pool of up to `workers` processes is started for this call.
+def run_workers(func, args, workers, executor=None):
+    if not args:
+        return []
+    if executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+            return list(pool.map(func, *zip(*args)))
+    return list(executor.map(func, *zip(*args))) # Reuse a caller's pool
+
+# Method for workers - parses and grades lines, returning compact columns instead of Students
+def grade_lines(cms, lines, chunk_id, today):
+    weights = cms.module_config.get_weights()
+    records = cms.parse_records(lines, chunk_id, set())
+
+    student_ids = [r[0] for r in records]
+    names = [r[1] for r in records]
+    dobs = [r[2] for r in records]
+    scores = np.asarray([r[3] for r in records], dtype=np.float64).reshape(len(records), len(weights))
+    with cms.metrics.timer('grade'):
+        overall, rounded, codes, ages = CohortGrader(cms.grader).grade(scores, weights, dobs, today)
+    cms.finish_run()
+    metrics = {'timers': cms.metrics.timers, 'rejected': cms.metrics.rejected, 'lines': len(lines)}
+    return student_ids, names, dobs, scores, overall, rounded, codes, ages, metrics
+
+# Worker for parallel mode - parses and grades one byte range of a file
+def grade_file_chunk(filename, start, end, module_configuration, chunk_id, today, rejections=None, id_digits=2, log=None):
+    cms = worker_system(module_configuration, rejections, id_digits, log)
+    with cms.metrics.timer('read'):
+        with open(filename, 'rb') as f:
+            f.seek(start)
+            text = f.read(end - start).decode(locale.getpreferredencoding(False))
+
+        lines = text.split('\n')
+        if not lines[-1]: # Range ends on a newline
+            lines.pop()
+    return grade_lines(cms, lines, chunk_id, today)
+
+# Worker for parallel multi-file mode - reads (decompressing if needed) and grades one whole file
+def grade_input_file(filename, module_configuration, file_id, today, rejections=None, id_digits=2, log=None):
+    cms = worker_system(module_configuration, rejections, id_digits, log)
+    with cms.metrics.timer('read'):
+        with open_input(filename) as f:
+            lines = list(iter_lines(f))
+    return grade_lines(cms, lines, file_id, today)
 
 def main():
+    configure_logging()
     cms = CategoricalMarkingSystem()
     cms.run()
 
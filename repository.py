@@ -0,0 +1,139 @@
+"""
+Categorical Marking System - Repository
+Keeps graded cohorts of many modules in one SQLite database, so results can be compared across
+modules and terms without reading the source files again.
+"""
+# Necessary Imports
+import json
+import sqlite3
+from datetime import datetime
+from itertools import islice
+
+DEFAULT_WRITE_BATCH = 50000 # Rows handed to executemany at a time, all inside one transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    module TEXT PRIMARY KEY,
+    weights TEXT NOT NULL,          -- JSON list of component weights
+    students INTEGER NOT NULL,
+    graded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    module TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dob TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    overall REAL NOT NULL,
+    rounded INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    scores BLOB NOT NULL,           -- little-endian float64 values, one per component
+    PRIMARY KEY (module, student_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS students_by_category ON students (category, module);
+CREATE INDEX IF NOT EXISTS students_by_overall ON students (module, overall);
+"""
+
+UPSERT = """
+INSERT INTO students (module, student_id, name, dob, age, overall, rounded, category, scores)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (module, student_id) DO UPDATE SET
+    name = excluded.name, dob = excluded.dob, age = excluded.age, overall = excluded.overall,
+    rounded = excluded.rounded, category = excluded.category, scores = excluded.scores
+"""
+
+COLUMNS = "module, student_id, name, dob, age, overall, rounded, category"
+
+
+# Cohort repository class - one row per student and module, upserted in bulk
+class CohortRepository:
+
+    # Initializing the connection - WAL lets readers query while a cohort is being written
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, one sync per checkpoint
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Method to write a graded cohort for a module - existing students of the module are updated, new ones added
+    def save_cohort(self, store, module, weights, replace=False, batch_size=DEFAULT_WRITE_BATCH):
+        scores = store.scores
+        rows = ((module, sid, name, dob, age, overall, rounded, category, scores[row].tobytes())
+                for row, (sid, name, dob, age, overall, rounded, category) in enumerate(store.iter_rows()))
+        with self.connection: # One transaction for the whole cohort
+            if replace: # Drop students that are no longer in the cohort
+                self.connection.execute("DELETE FROM students WHERE module = ?", (module,))
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                self.connection.executemany(UPSERT, batch)
+            count = self.connection.execute("SELECT COUNT(*) FROM students WHERE module = ?", (module,)).fetchone()[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO modules (module, weights, students, graded_at) VALUES (?, ?, ?, ?)",
+                (module, json.dumps(list(weights)), count, datetime.now().isoformat(timespec='seconds')))
+        return count
+
+    # Method to remove a module and its students
+    def delete_module(self, module):
+        with self.connection:
+            self.connection.execute("DELETE FROM students WHERE module = ?", (module,))
+            self.connection.execute("DELETE FROM modules WHERE module = ?", (module,))
+
+    # Method to list the stored modules - {module: (students, weights, graded_at)}
+    def modules(self):
+        return {module: (students, json.loads(weights), graded_at) for module, weights, students, graded_at in
+                self.connection.execute("SELECT module, weights, students, graded_at FROM modules ORDER BY module")}
+
+    # Method to find students in any of the categories, optionally limited to some modules
+    def students_in_categories(self, categories, modules=None):
+        categories = list(categories)
+        query = f"SELECT {COLUMNS} FROM students WHERE category IN ({','.join('?' * len(categories))})"
+        params = categories
+        if modules is not None:
+            modules = list(modules)
+            query += f" AND module IN ({','.join('?' * len(modules))})"
+            params += modules
+        return self.connection.execute(query + " ORDER BY module, student_id", params).fetchall()
+
+    # Method to iterate over a module's students in ID order - (id, name, dob, age, overall, rounded, category),
+    # the row format export_rows takes
+    def iter_rows(self, module):
+        cursor = self.connection.execute(
+            "SELECT student_id, name, dob, age, overall, rounded, category FROM students WHERE module = ? "
+            "ORDER BY student_id", (module,))
+        while True:
+            rows = cursor.fetchmany(DEFAULT_WRITE_BATCH)
+            if not rows:
+                break
+            yield from rows
+
+    # Method to get a module's category histogram, largest first
+    def category_counts(self, module):
+        return dict(self.connection.execute(
+            "SELECT category, COUNT(*) FROM students WHERE module = ? GROUP BY category ORDER BY COUNT(*) DESC",
+            (module,)))
+
+    # Method to get min, max, mean and median of a module's overall scores - the median is read from the
+    # (module, overall) index, so nothing is sorted
+    def analytics(self, module):
+        count, minimum, maximum, mean = self.connection.execute(
+            "SELECT COUNT(*), MIN(overall), MAX(overall), AVG(overall) FROM students WHERE module = ?",
+            (module,)).fetchone()
+        if not count:
+            return {'count': 0, 'minimum': None, 'maximum': None, 'mean': None, 'median': None}
+        middle = [value for value, in self.connection.execute(
+            "SELECT overall FROM students WHERE module = ? ORDER BY overall LIMIT ? OFFSET ?",
+            (module, 2 - count % 2, (count - 1) // 2))]
+        return {'count': count, 'minimum': minimum, 'maximum': maximum, 'mean': mean,
+                'median': sum(middle) / len(middle)}
@@ -0,0 +1,181 @@
+"""
+Categorical Marking System - Cohort snapshots
+Versioned binary snapshots of a graded cohort, reloaded through mmap.
+
+Layout (little endian):
+    magic (8 bytes) | version (u32) | metadata length (u32) | metadata (JSON)
+    padding to 8 bytes
+    records - one fixed-width record per student (see record_dtype)
+    string offsets - u64 x (strings + 1)
+    string data - UTF-8
+"""
+# Necessary Imports
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+import numpy as np
+from cohort import calculate_ages, parse_dobs
+
+MAGIC = b'CMSSNAP\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+METADATA_KEYS = ('count', 'width', 'strings', 'id_format', 'id_labels', 'category_names', 'graded_on', 'grading', 'source')
+
+
+# Method to build the record layout for a given number of scores - 8 byte aligned
+def record_dtype(width):
+    return np.dtype([
+        ('id', '<i8'),
+        ('overall', '<f8'),
+        ('scores', '<f8', (width,)),
+        ('name', '<u4'),
+        ('dob', '<u4'),
+        ('rounded', '<i2'),
+        ('age', '<i2'),
+        ('code', 'i1'),
+        ('pad', 'V3'),
+    ])
+
+
+# Method to align an offset to 8 bytes
+def align(offset):
+    return (offset + 7) & ~7
+
+
+# Method to describe how a cohort was graded - used to detect stale snapshots
+def grading_signature(weights, grader):
+    return {
+        'weights': [float(w) for w in weights],
+        'boundaries': list(grader.boundaries),
+        'categories': list(grader.categories),
+    }
+
+
+# Method to describe an input file so an unchanged file can be recognised
+def source_signature(filename):
+    info = os.stat(filename)
+    return {'path': os.path.abspath(filename), 'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+
+# String table class - decodes names and dates of birth from the mapped file on demand
+class MappedStrings:
+
+    # Initializing offsets and the mapped data
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, code):
+        start, end = int(self.offsets[code]), int(self.offsets[code + 1])
+        return str(self.data[start:end], 'utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+# Method to save a cohort store to a snapshot file - rows from `start` on, e.g. the rows of one checkpoint segment, in
+# which case only the strings those rows use are written
+def save_snapshot(store, filename, weights, grader, source=None, extra=None, start=0):
+    width = store.width or len(weights)
+    count = store.size - start
+    names, dobs, strings = store.name_column[start:store.size], store.dob_column[start:store.size], store.strings
+    if start:
+        used, inverse = np.unique(np.concatenate([names, dobs]), return_inverse=True)
+        names, dobs = inverse[:count], inverse[count:]
+        strings = [store.strings[int(code)] for code in used]
+    records = np.zeros(count, dtype=record_dtype(width))
+    records['id'] = store.ids[start:]
+    records['overall'] = store.overall[start:]
+    records['scores'] = store.scores[start:].reshape(count, width)
+    records['name'] = names
+    records['dob'] = dobs
+    records['rounded'] = store.rounded[start:]
+    records['age'] = store.ages[start:]
+    records['code'] = store.codes[start:]
+
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+
+    metadata = {
+        'count': count,
+        'width': width,
+        'strings': len(encoded),
+        'id_format': store.id_format,
+        'id_labels': {str(row - start): label for row, label in store.id_labels.items() if row >= start},
+        'category_names': list(store.category_names),
+        'graded_on': datetime.now().date().isoformat(),
+        'grading': grading_signature(weights, grader),
+        'source': source,
+        'extra': extra, # Caller's own state, e.g. the read position of a checkpoint
+    }
+    meta = json.dumps(metadata).encode('utf-8')
+
+    # Write to a temporary file first so a crash never leaves a half-written snapshot
+    temp = f"{filename}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        f.write(b'\0' * (align(f.tell()) - f.tell()))
+        f.write(records.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b''.join(encoded))
+    os.replace(temp, filename)
+
+
+# Method to read only the snapshot metadata - raises ValueError for anything that is not a complete snapshot header
+def read_metadata(filename):
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{filename} is too short to be a cohort snapshot.")
+        magic, version, meta_length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a cohort snapshot.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        meta = f.read(meta_length)
+    if len(meta) < meta_length:
+        raise ValueError(f"{filename} is truncated.")
+    metadata = json.loads(meta) # JSONDecodeError and UnicodeDecodeError are ValueErrors
+    if not isinstance(metadata, dict) or any(key not in metadata for key in METADATA_KEYS):
+        raise ValueError(f"{filename} has incomplete snapshot metadata.")
+    metadata.setdefault('extra', None) # Snapshots written before checkpoints had no extra block
+    return metadata
+
+
+# Method to load a snapshot into a cohort store - columns are views over the mapped file, not copies
+def load_snapshot(store, filename, weights, grader, source=None):
+    metadata = read_metadata(filename)
+    if metadata['grading'] != grading_signature(weights, grader):
+        raise ValueError("Snapshot was graded with different weights or boundaries.")
+    if source is not None and metadata['source'] != source:
+        raise ValueError("Snapshot does not match the input file.")
+    if metadata['id_format'] != store.id_format:
+        raise ValueError("Snapshot was written with a different student ID format.")
+
+    with open(filename, 'rb') as f:
+        # Copy-on-write mapping - later edits to the store never touch the file
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    count, width = metadata['count'], metadata['width']
+    offset = align(HEADER.size + HEADER.unpack_from(data)[2])
+    records = np.frombuffer(data, dtype=record_dtype(width), count=count, offset=offset)
+    offset += records.nbytes
+    string_offsets = np.frombuffer(data, dtype='<u8', count=metadata['strings'] + 1, offset=offset)
+    offset += string_offsets.nbytes
+    strings = MappedStrings(string_offsets, memoryview(data)[offset:])
+
+    store.category_names = list(metadata['category_names'])
+    store.category_codes = {name: code for code, name in enumerate(store.category_names)}
+    columns = {name: records[name] for name in ('id', 'overall', 'scores', 'name', 'dob', 'rounded', 'age', 'code')}
+    store.attach(columns, strings, {int(row): label for row, label in metadata['id_labels'].items()})
+
+    # Ages were correct on the day of grading - recompute them per distinct date of birth otherwise
+    if metadata['graded_on'] != datetime.now().date().isoformat() and count:
+        dob_codes, inverse = np.unique(store.dob_column, return_inverse=True)
+        ages = calculate_ages(parse_dobs([strings[int(code)] for code in dob_codes]))
+        store.age_column[:] = ages[inverse]
+    return metadata
@@ -1,33 +1,80 @@
 import random
+import sys
 from datetime import datetime, timedelta
-import names  # pip install names
 
-def generate_test_data(num_records=1000):
-    # Generate dates between 1990 and 2005
+# Built-in name lists so no extra package is needed
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+               "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Betty", "Mark", "Sandra", "Steven", "Ashley",
+               "Paul", "Emily", "Andrew", "Donna", "Joshua", "Michelle", "Kevin", "Carol", "Brian", "Amanda",
+               "George", "Melissa", "Timothy", "Deborah", "Ronald", "Stephanie", "Jason", "Rebecca", "Gregory", "Laura"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+              "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+              "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts"]
+
+# Broken lines used for the malformed fraction - one of each kind of rejection
+MALFORMED_LINES = [
+    "{id},{name},{dob}",                        # Wrong number of parts
+    "X{id},{name},{dob},{scores}",              # Bad ID
+    "{id},{name}9,{dob},{scores}",              # Bad name
+    "{id},{name},{dob}x,{scores}",              # Bad date of birth
+    "{id},{name},{dob},101.00,{scores3}",       # Score out of range
+    "{id},{name},{dob},abc,{scores3}",          # Score is not a number
+]
+
+
+def id_width_for(num_records):
+    """Digits in every ID of a file with num_records lines - the ID format needed to read it back."""
+    return max(2, len(str(num_records - 1)))
+
+
+def generate_test_data(num_records=1000, filename='test_data.txt', seed=None, malformed=0.0, duplicates=0.0,
+                       num_scores=4, id_width=None, chunk_size=100000):
+    """Write num_records lines of test data - the same seed always gives the same file.
+
+    malformed and duplicates are the fractions of lines that are broken or repeat an earlier ID.
+    """
+    rng = random.Random(seed)
+    id_width = id_width or id_width_for(num_records) # Every ID has the same number of digits
+
+    # Every date between 1990 and 2005, formatted once
     start_date = datetime(1990, 1, 1)
-    end_date = datetime(2005, 12, 31)
-    
-    with open('test_data.txt', 'w') as f:
-        for i in range(num_records):
-            # Generate random student ID (2 digits, zero-padded)
-            student_id = f"{i:02d}"
-            
-            # Generate random name
-            name = names.get_full_name()
-            
-            # Generate random date of birth
-            days_between = (end_date - start_date).days
-            random_days = random.randint(0, days_between)
-            random_date = start_date + timedelta(days=random_days)
-            dob = random_date.strftime('%Y-%m-%d')
-            
-            # Generate 4 random scores
-            scores = [random.uniform(0, 100) for _ in range(4)]
-            scores_str = ','.join(f"{score:.2f}" for score in scores)
-            
-            # Write to file in required format
-            f.write(f"{student_id},{name},{dob},{scores_str}\n")
+    days_between = (datetime(2005, 12, 31) - start_date).days
+    dobs = [(start_date + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(days_between + 1)]
+    full_names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    score_format = ','.join(['%.2f'] * num_scores)
+
+    with open(filename, 'w', buffering=1 << 20) as f:
+        for chunk_start in range(0, num_records, chunk_size):
+            lines = []
+            for i in range(chunk_start, min(chunk_start + chunk_size, num_records)):
+                student_id = f"{i:0{id_width}d}"
+                name = rng.choice(full_names)
+                dob = rng.choice(dobs)
+                scores = score_format % tuple(rng.random() * 100 for _ in range(num_scores))
+                roll = rng.random()
+                if roll < malformed:
+                    template = rng.choice(MALFORMED_LINES)
+                    scores3 = scores.split(',', 1)[1] if num_scores > 1 else ''
+                    lines.append(template.format(id=student_id, name=name, dob=dob, scores=scores, scores3=scores3))
+                    continue
+                if i and roll < malformed + duplicates: # Reuse an earlier ID
+                    student_id = f"{rng.randrange(i):0{id_width}d}"
+                lines.append(f"{student_id},{name},{dob},{scores}")
+            f.write('\n'.join(lines))
+            f.write('\n')
+
 
 if __name__ == "__main__":
-    generate_test_data()
-    print("Test data generated in test_data.txt")
\ No newline at end of file
+    # Usage: python test_data_generator.py [num_records] [filename] [seed] [malformed] [duplicates]
+    args = sys.argv[1:]
+    generate_test_data(
+        num_records=int(args[0]) if len(args) > 0 else 1000,
+        filename=args[1] if len(args) > 1 else 'test_data.txt',
+        seed=int(args[2]) if len(args) > 2 else None,
+        malformed=float(args[3]) if len(args) > 3 else 0.0,
+        duplicates=float(args[4]) if len(args) > 4 else 0.0,
+    )
+    print(f"Test data generated in {args[1] if len(args) > 1 else 'test_data.txt'}")